@@ -29,6 +29,7 @@ class Account:
         enter_position - * Adjusts the cash and asset value of the account on entering a trade
                          * Inputs:
                              option_price, num_contracts
+                             cost - execution costs paid on top of the option price (see CostModel)
 
         update_position - * Adjusts the cash and asset value of the account while in a trade
                           * Inputs:
@@ -37,6 +38,7 @@ class Account:
         exit_position - * Adjusts the cash and asset value of the account on exiting a trade
                         * Inputs:
                             option_price, num_contracts
+                            cost - execution costs taken from the sale (see CostModel)
         '''
 
     def __init__(self, initial_cash=50000):
@@ -47,18 +49,21 @@ class Account:
     def calculate_asset_value_(option_price, num_contracts):
         return option_price * num_contracts
 
-    def enter_position(self, option_price, num_contracts):
+    def enter_position(self, option_price, num_contracts, cost=0.0):
         '''To enter a position, need to determine how many shares to purchase then adjust the balances'''
         current_asset_value = self.calculate_asset_value_(option_price, num_contracts)
-        self.cash_value = self.cash_value - current_asset_value
-        self.asset_value = current_asset_value
+        self.cash_value = self.cash_value - current_asset_value - cost
+        if self.asset_value is None:
+            self.asset_value = current_asset_value
+        else:
+            self.asset_value = self.asset_value + current_asset_value
 
     def update_position(self, option_price, num_contracts):
         '''After the price has been updated, the asset value is adjusted.'''
         self.asset_value = self.calculate_asset_value_(option_price, num_contracts)
 
-    def exit_position(self, option_price, num_contracts):
+    def exit_position(self, option_price, num_contracts, cost=0.0):
         '''To enter a position, need to sell all shares then adjust the balances'''
         current_asset_value = self.calculate_asset_value_(option_price, num_contracts)
-        self.cash_value = self.cash_value + current_asset_value
+        self.cash_value = self.cash_value + current_asset_value - cost
         self.asset_value = None
@@ -13,62 +13,225 @@ File contents:
 
 from Account import Account
 from SignalCreation import expand_market_data
-from TradeLogic import trade_logic
+from FeatureCache import default_feature_cache
+from TradeLogic import trade_logic_step, portfolio_trade_logic_step, TRADE_LOGIC_COLUMNS
+from Portfolio import Portfolio
+from BlackScholesOptionPricing import option_greeks
 from pandas import DataFrame
+from contextlib import nullcontext
+from numpy import full, nan, isnan, nan_to_num
+
+
+JOURNAL_COLUMNS = ["UnderlyingValue", "AssetValue", "CashValue", "PortfolioValue"]
+GREEK_COLUMNS = ["Delta", "Gamma", "Vega", "Theta", "Rho"]
 
 
 class Backtest:
     '''
     attributes
     ----------
-        market_data - Expanded market data of an underlying asset
+        market_data - Expanded market data of an underlying asset, either given or expanded from price_series
         account_data - Account object to keep track of asset and cash value
         trade_size_logic - Function to determine the number of contracts to trade
-        trade_journal - Dictionary object holding the asset, cash, and total value of the account
+        trade_journal - np.ndarray (days x journal_columns) holding the underlying, asset, cash, and total value
+                        of the account, with NaN asset values when no asset is held
+        journal_columns - JOURNAL_COLUMNS, followed by GREEK_COLUMNS when record_greeks is set
+        position_journal - np.ndarray (days x [contracts, strike, tau, rate]) of the held option, only kept
+                           when record_greeks is set without multi_position (the Greeks of a portfolio are
+                           summed over its positions every day instead)
+        portfolio - Portfolio of concurrent positions, used by the trade logic instead of current_option
+                    when multi_position is set
+        instrumentation - Optional Instrumentation object timing the feature expansion, the trade logic
+                          branches and the option pricing of the run (row, columnar or multi-position)
+        pricing_cache - Optional PricingCache in front of the option pricing of the single position trade logic
+        cost_model - Optional CostModel charging the execution costs of every entry and exit
         expiry_series - Series of expiration dates
+        feature_cache - FeatureCache shared between backtests (None to always recompute the features)
 
         current_option - The current option to be traded
         num_contracts - The current number of contracts of the option to be held
 
     methods
     -------
-        run_backtest - runs the backtest
-        update_trade_journal - function to update the trade_journal dictionary
+        run_backtest - runs the backtest, either over columnar arrays (default) or pd.DataFrame rows
+        run_backtest_in_chunks - generator running the columnar backtest a chunk of days at a time
+        run_compiled_backtest - runs the single position backtest with the compiled kernel, see CompiledKernel
+        update_trade_journal - function to update the trade_journal row of a day
         export_results_as_df - returns a pd.DataFrame object of the trade_journal
+        export_instrumentation_as_df - returns a pd.DataFrame report of the instrumentation
+        record_greeks_ - fills the portfolio Greeks of the trade_journal from the position_journal
     '''
 
-    def __init__(self, price_series, trade_size_logic, option_type, expiry_series, ma_lag=200):
-        self.market_data = expand_market_data(price_series, option_type, ma_lag, expiry_series)
+    def __init__(self, price_series, trade_size_logic, option_type, expiry_series, ma_lag=200,
+                 min_days_to_expiry=90, n_strikes_away=1, volatility_window=20, feature_cache=default_feature_cache,
+                 record_greeks=False, multi_position=False, instrumentation=None, pricing_cache=None,
+                 strike_increment=2.5, market_data=None, cost_model=None):
+        self.instrumentation = instrumentation
+        self.pricing_cache = pricing_cache
+        self.cost_model = cost_model
+        if market_data is not None:
+            # Already expanded (e.g. a window of a longer history), so price_series and the feature
+            # parameters are not used
+            self.market_data = market_data
+        else:
+            with self.measure_("expand_market_data"):
+                self.market_data = expand_market_data(price_series, option_type, ma_lag, expiry_series,
+                                                      min_days_to_expiry=min_days_to_expiry,
+                                                      n_strikes_away=n_strikes_away,
+                                                      volatility_window=volatility_window,
+                                                      feature_cache=feature_cache, strike_increment=strike_increment)
         self.account_data = Account()
         self.trade_size_logic = trade_size_logic
-        self.trade_journal = {}
+        self.journal_columns = JOURNAL_COLUMNS + (GREEK_COLUMNS if record_greeks else [])
+        self.trade_journal = full((len(self.market_data), len(self.journal_columns)), nan)
+        self.trade_journal[:, 0] = self.market_data.Price.to_numpy()
+        self.record_greeks = record_greeks
+        # In portfolio mode the Greeks are summed over the positions as they are held instead
+        self.position_journal = full((len(self.market_data), 4), nan) if record_greeks and not multi_position else None
         self.option_type = option_type
         self.expiry_series = expiry_series
+        self.feature_cache = feature_cache
 
         self.current_option = None
         self.num_contracts = None
+        self.portfolio = Portfolio(self.account_data, instrumentation=instrumentation) if multi_position else None
 
-    def update_trade_journal(self, day):
-        u_value = self.market_data.Price.loc[day]
+    def update_trade_journal(self, i):
+        '''Records the account of the i-th day, the underlying value is filled in when the journal is created.'''
         a_value = self.account_data.asset_value
         c_value = self.account_data.cash_value
 
         if a_value is None:
-            p_value = c_value
+            self.trade_journal[i, 1:4] = (nan, c_value, c_value)
         else:
-            p_value = c_value + a_value
-
-        self.trade_journal[day] = [u_value, a_value, c_value, p_value]
+            self.trade_journal[i, 1:4] = (a_value, c_value, c_value + a_value)
+
+        if self.record_greeks and self.portfolio is not None:
+            greeks = self.portfolio.greeks(self.market_data.Price.iat[i], self.market_data.Volatility.iat[i],
+                                           self.market_data.t.iat[i])
+            self.trade_journal[i, len(JOURNAL_COLUMNS):] = [greeks[name.lower()] for name in GREEK_COLUMNS]
+
+        if self.position_journal is not None and self.current_option is not None:
+            option = self.current_option
+            self.position_journal[i] = (self.num_contracts, option.K, option.format_tau(self.market_data.t.iat[i]),
+                                        option.r)
+
+    def record_greeks_(self):
+        '''Prices the Greeks of every held position in one vectorized call and scales them by the contracts held.'''
+        num_contracts, strikes, taus, rates = self.position_journal.T
+        held = ~isnan(num_contracts)
+        prices = self.market_data.Price.to_numpy()[held]
+        volatility = self.market_data.Volatility.to_numpy()[held]
+
+        greeks = option_greeks(prices, strikes[held], taus[held], rates[held], volatility, self.option_type)
+        greek_journal = self.trade_journal[:, len(JOURNAL_COLUMNS):]
+        greek_journal[:] = 0.0
+        for j, name in enumerate(GREEK_COLUMNS):
+            greek_journal[held, j] = greeks[name.lower()] * num_contracts[held]
 
     def export_results_as_df(self):
-        columns = ["UnderlyingValue", "AssetValue", "CashValue", "PortfolioValue"]
-        return DataFrame(self.trade_journal, index=columns).T
-
-    def run_backtest(self):
-        for day, current_market_data in self.market_data.iterrows():
-            input_vec = [current_market_data, self.current_option, self.num_contracts,
-                         self.trade_size_logic, self.account_data, self.option_type]
-
-            self.current_option, self.num_contracts = trade_logic(*input_vec)
-
-            self.update_trade_journal(day)
\ No newline at end of file
+        '''Returns a pd.DataFrame view of the trade_journal, without copying it.'''
+        return DataFrame(self.trade_journal, index=self.market_data.index, columns=self.journal_columns, copy=False)
+
+    def measure_(self, name):
+        return nullcontext() if self.instrumentation is None else self.instrumentation.measure(name)
+
+    def export_instrumentation_as_df(self):
+        '''Returns the Instrumentation report of the run, see Instrumentation.report'''
+        return self.instrumentation.report()
+
+    def run_backtest(self, columnar=True):
+        with self.measure_("run_backtest"):
+            if columnar:
+                self.run_columnar_backtest_()
+            else:
+                self.run_row_backtest_()
+
+        if self.position_journal is not None:
+            self.record_greeks_()
+
+    def run_backtest_in_chunks(self, chunk_size=250):
+        '''
+        Generator running the columnar backtest chunk_size days at a time, yielding the (start, stop) days run
+        after every chunk so that the caller can report progress or stop early. The Greeks are recorded
+        before the last chunk is yielded.
+        '''
+        columns = self.market_columns_()
+        n_days = len(self.market_data)
+        for start in range(0, n_days, chunk_size):
+            stop = min(start + chunk_size, n_days)
+            self.run_columnar_days_(columns, start, stop)
+            if stop == n_days and self.position_journal is not None:
+                self.record_greeks_()
+            yield start, stop
+
+    def run_compiled_backtest(self, sizing_rule="percent_cash", sizing_parameter=0.9):
+        '''
+        Runs the single position backtest with the compiled kernel of CompiledKernel. The sizing is given as
+        one of its SIZING_RULES in place of the trade_size_logic function.
+        '''
+        if self.portfolio is not None or self.position_journal is not None or self.cost_model is not None:
+            raise ValueError("The compiled backtest supports neither multi_position, record_greeks nor cost_model")
+
+        # Imported here so that Numba is only loaded by the runs that use it
+        from CompiledKernel import run_trade_kernel
+        asset_values, cash_values = run_trade_kernel(self.market_data, self.option_type, sizing_rule,
+                                                     sizing_parameter, self.account_data.cash_value)
+        asset_values, cash_values = asset_values[:, 0], cash_values[:, 0]
+        self.trade_journal[:, 1] = asset_values
+        self.trade_journal[:, 2] = cash_values
+        self.trade_journal[:, 3] = cash_values + nan_to_num(asset_values)
+
+        self.account_data.cash_value = cash_values[-1]
+        self.account_data.asset_value = None if isnan(asset_values[-1]) else asset_values[-1]
+
+    def run_row_backtest_(self):
+        self.run_days_([row[column] for column in TRADE_LOGIC_COLUMNS] for _, row in self.market_data.iterrows())
+
+    def market_columns_(self):
+        '''Returns the TRADE_LOGIC_COLUMNS as arrays, with datetime columns as Timestamps like in the rows.'''
+        columns = []
+        for column in TRADE_LOGIC_COLUMNS:
+            values = self.market_data[column]
+            columns.append(values.to_numpy(dtype=object) if values.dtype.kind == "M" else values.to_numpy())
+        return columns
+
+    def run_columnar_backtest_(self):
+        # Pull the columns out once so the loop only touches plain arrays instead of boxing a row per day
+        self.run_columnar_days_(self.market_columns_(), 0, len(self.market_data))
+
+    def run_columnar_days_(self, columns, start, stop):
+        '''Runs the days start to stop of the market data columns.'''
+        self.run_days_(zip(*[column[start:stop] for column in columns]), start)
+
+    def run_days_(self, days, start=0):
+        '''
+        The day loop of every backtest path: runs the trade logic over the TRADE_LOGIC_COLUMNS values of the
+        consecutive days from start, timing every day under the branch it takes when instrumented.
+        '''
+        for i, market_values in enumerate(days, start):
+            with self.measure_branch_(*market_values[:3]):
+                if self.portfolio is None:
+                    input_vec = [self.current_option, self.num_contracts, self.trade_size_logic,
+                                 self.account_data, self.option_type, self.instrumentation, self.pricing_cache,
+                                 self.cost_model]
+                    self.current_option, self.num_contracts = trade_logic_step(*market_values, *input_vec)
+                else:
+                    portfolio_trade_logic_step(*market_values, self.portfolio, self.trade_size_logic,
+                                               self.option_type, cost_model=self.cost_model)
+
+            self.update_trade_journal(i)
+
+    def measure_branch_(self, in_trade, entry, exit_signal):
+        '''Times a day of the trade logic under the branch it takes, nothing without instrumentation.'''
+        if self.instrumentation is None:
+            return nullcontext()
+
+        holding = self.current_option is not None if self.portfolio is None else len(self.portfolio) > 0
+        if in_trade and entry:
+            branch = "trade_logic_entry"
+        elif in_trade and holding:
+            branch = "trade_logic_exit" if exit_signal else "trade_logic_update"
+        else:
+            branch = "trade_logic_idle"
+        return self.instrumentation.measure(branch)
@@ -0,0 +1,189 @@
+'''
+
+BacktestService.py
+
+Asyncio front end running backtests without blocking the event loop, e.g. behind a web handler:
+
+    service = BacktestService(max_workers=4)
+    job_id = service.submit({"data": {"source": "ou", "sample_length": 2000}, "run": {"ma_lag": 100}})
+    async for event in service.events(job_id):
+        ...  # status, journal, progress and finally one of done, cancelled or failed
+
+File contents:
+
+    classes
+    -------
+        BacktestJob
+        BacktestService
+
+    constants
+    ---------
+        FINAL_EVENTS
+
+'''
+
+import asyncio
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from ParameterSweep import build_backtest, summarize_results
+from RunBacktests import build_runs, load_market_data
+
+
+# Event types after which a job emits nothing more
+FINAL_EVENTS = ("done", "cancelled", "failed")
+
+
+class BacktestJob:
+    '''
+    A backtest submitted to a BacktestService.
+
+    attributes
+    ----------
+    job_id - Identifier of the job within its service
+    spec - The run spec of the job: {"data": ..., "run": ...}, see RunBacktests.load_market_data and build_runs
+    status - One of queued, running, done, cancelled, failed
+    days_run, total_days - Progress of the run
+    journal - pd.DataFrame of the trade journal once done
+    metrics - Dictionary of the metrics of the journal once done, see summarize_results
+    error - Description of the error once failed
+    '''
+
+    def __init__(self, job_id, spec):
+        self.job_id = job_id
+        self.spec = spec
+        self.status = "queued"
+        self.days_run = 0
+        self.total_days = None
+        self.journal = None
+        self.metrics = None
+        self.error = None
+
+        self.cancel_requested_ = threading.Event()
+        self.events_ = asyncio.Queue()
+        self.future_ = None
+
+
+class BacktestService:
+    '''
+    Runs submitted backtests on a bounded pool of worker threads and streams their results as events, so that
+    one process serves many concurrent requests. A job runs its days in chunks: after every chunk the new
+    rows of its trade journal and its progress are sent to the event loop, and a cancelled job stops.
+
+    Every event is a dictionary with a job_id and a type:
+        status - the job started running
+        journal - rows start to stop of the trade journal as a pd.DataFrame (the Greek columns, when
+                  recorded, are only filled in the final journal)
+        progress - days run out of total_days
+        done - the metrics of the finished journal
+        cancelled, failed - the job stopped, failed with its error
+
+    initial inputs
+    --------------
+    max_workers - The number of backtests run at once, further jobs are queued
+    chunk_size - The number of days run between two events
+    executor - Optional thread executor (e.g. a ThreadPoolExecutor) to run the jobs on instead of a new thread
+               pool. Process executors cannot be used, as the jobs send their events to the event loop.
+
+    methods
+    -------
+    submit - * Queues a run spec, returning its job_id. Must be called from the event loop.
+             * Inputs:
+                 spec, price_series, expiry_series - the series are used instead of the spec's data section
+
+    events - * Asynchronous iterator of the events of a job, ending with its final event
+             * Inputs:
+                 job_id
+
+    result - * Waits for a job and returns its trade journal, raising an error if it did not finish
+             * Inputs:
+                 job_id
+
+    cancel - * Requests a job to stop, returning False if it had already finished
+             * Inputs:
+                 job_id
+
+    shutdown - * Cancels every unfinished job and shuts the executor down
+    '''
+
+    def __init__(self, max_workers=4, chunk_size=250, executor=None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers) if executor is None else executor
+        self.chunk_size = chunk_size
+        self.jobs = {}
+        self.job_ids_ = itertools.count()
+
+    def submit(self, spec, price_series=None, expiry_series=None):
+        loop = asyncio.get_running_loop()
+        job = BacktestJob(next(self.job_ids_), spec)
+        self.jobs[job.job_id] = job
+
+        def emit(event_type, **values):
+            event = dict(values, job_id=job.job_id, type=event_type)
+            loop.call_soon_threadsafe(job.events_.put_nowait, event)
+
+        job.future_ = loop.run_in_executor(self.executor, self.run_job_, job, emit, price_series, expiry_series)
+        return job.job_id
+
+    def run_job_(self, job, emit, price_series, expiry_series):
+        '''Runs a job on a worker thread, sending its events to the event loop through emit.'''
+        try:
+            if job.cancel_requested_.is_set():
+                job.status = "cancelled"
+                emit("cancelled")
+                return
+
+            job.status = "running"
+            emit("status", status=job.status)
+            run = build_runs({"defaults": job.spec.get("run", {})})[0]
+            if price_series is None:
+                price_series, expiry_series = load_market_data(job.spec.get("data", {}))
+
+            bt = build_backtest(run, price_series, expiry_series)
+            journal = bt.export_results_as_df()
+            job.total_days = len(journal)
+            for start, stop in bt.run_backtest_in_chunks(self.chunk_size):
+                job.days_run = stop
+                emit("journal", start=start, stop=stop, rows=journal.iloc[start:stop].copy())
+                emit("progress", days_run=stop, total_days=job.total_days)
+                if job.cancel_requested_.is_set():
+                    job.status = "cancelled"
+                    emit("cancelled")
+                    return
+
+            job.journal = journal
+            job.metrics = summarize_results(journal)
+            job.status = "done"
+            emit("done", metrics=job.metrics)
+
+        except Exception as error:
+            job.error = "%s: %s" % (type(error).__name__, error)
+            job.status = "failed"
+            emit("failed", error=job.error)
+
+    async def events(self, job_id):
+        '''Every event is delivered once, so a job's events should be consumed by a single caller.'''
+        job = self.jobs[job_id]
+        while True:
+            event = await job.events_.get()
+            yield event
+            if event["type"] in FINAL_EVENTS:
+                return
+
+    async def result(self, job_id):
+        job = self.jobs[job_id]
+        await job.future_
+        if job.status != "done":
+            raise RuntimeError("Job %s %s%s" % (job_id, job.status, "" if job.error is None else ": " + job.error))
+        return job.journal
+
+    def cancel(self, job_id):
+        job = self.jobs[job_id]
+        if job.status in FINAL_EVENTS:
+            return False
+        job.cancel_requested_.set()
+        return True
+
+    def shutdown(self):
+        for job_id in self.jobs:
+            self.cancel(job_id)
+        self.executor.shutdown(wait=False)
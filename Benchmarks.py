@@ -0,0 +1,198 @@
+'''
+
+Benchmarks.py
+
+Times and memory-profiles every stage of the pipeline at several series lengths, saves the results as JSON
+and compares them against a baseline to flag regressions.
+
+    python Benchmarks.py --lengths 1000 10000 100000 --output bench.json --baseline baseline.json
+
+File contents:
+
+    functions
+    ---------
+        benchmark_data
+        benchmark_stages
+        measure
+        run_benchmarks
+        compare_to_baseline
+
+'''
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from Backtest import Backtest
+from BlackScholesOptionPricing import call_option_prices, put_option_prices
+from PriceSimulation import create_ou_process, ou_process_function
+from SignalCreation import expand_market_data, calculate_optimal_expiration_date, create_entry_and_exit_signal
+from SignalCreation import calculate_historical_volatility
+from TradeLogic import trade_size_logic
+from UtilityFunctions import bull_crosses, bear_crosses
+
+
+DEFAULT_LENGTHS = [1000, 10000, 100000, 1000000]
+
+
+def benchmark_data(length, random_state=0):
+    '''
+    Builds a seeded price series of the given length with its expiration dates. Hourly bars are used so that
+    even the longest series stays within the datetime64[ns] range.
+    '''
+    prices = ou_process_function(30, 50, 0.01, 0.5, length, random_state)
+    index = pd.date_range(end=pd.Timestamp("2020-01-01"), periods=length, freq="h")
+    expiries = pd.Series(pd.date_range(index[0].normalize(), index[-1] + pd.Timedelta(days=365), freq="WOM-3FRI"))
+    return pd.Series(prices, index=index), expiries
+
+
+def benchmark_stages(length, ma_lag=200, random_state=0):
+    '''
+    Returns a dictionary of stage name to (setup, stage) functions. setup prepares the inputs outside of the
+    measurement and returns the arguments passed to stage.
+    '''
+    def data():
+        return benchmark_data(length, random_state)
+
+    def times():
+        prices, expiries = data()
+        return (prices.index.to_series(), expiries)
+
+    def frame():
+        prices, expiries = data()
+        df = prices.to_frame("Price")
+        df["MovingAverage"] = df.Price.rolling(ma_lag).mean()
+        return (df, bull_crosses, bear_crosses)
+
+    def contracts():
+        rng = np.random.default_rng(random_state)
+        return (rng.uniform(20, 80, length), rng.uniform(20, 80, length), rng.uniform(0, 1, length), 0.03,
+                rng.uniform(0.1, 1, length))
+
+    def backtest():
+        prices, expiries = data()
+        return (Backtest(prices, trade_size_logic, "call", expiries, ma_lag, feature_cache=None),)
+
+    def simulate():
+        return create_ou_process(sample_length=length, random_state=random_state)
+
+    def expand(prices, expiries):
+        return expand_market_data(prices, "call", ma_lag, expiries, feature_cache=None)
+
+    return {
+        "create_ou_process": (lambda: (), simulate),
+        "expand_market_data": (data, expand),
+        "calculate_optimal_expiration_date": (times, calculate_optimal_expiration_date),
+        "create_entry_and_exit_signal": (frame, create_entry_and_exit_signal),
+        "calculate_historical_volatility": (lambda: (data()[0],), calculate_historical_volatility),
+        "call_option_prices": (contracts, call_option_prices),
+        "put_option_prices": (contracts, put_option_prices),
+        "run_backtest": (backtest, lambda bt: bt.run_backtest()),
+    }
+
+
+def measure(setup, stage, repeats=3):
+    '''
+    Measures a stage, returning the best wall time over the repeats and the peak memory allocated by one
+    separate traced run (tracing slows the stage down, so it is not timed). The stage is run once untimed
+    first, so that lazy imports and other one-off costs are not counted.
+    '''
+    stage(*setup())
+
+    seconds = []
+    for _ in range(repeats):
+        args = setup()
+        start = time.perf_counter()
+        stage(*args)
+        seconds.append(time.perf_counter() - start)
+
+    args = setup()
+    tracemalloc.start()
+    stage(*args)
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": min(seconds), "peak_bytes": peak_bytes}
+
+
+def run_benchmarks(lengths=DEFAULT_LENGTHS, stages=None, repeats=3, verbose=True):
+    '''
+    Runs every stage at every length. A stage that fails (e.g. the date simulation running out of calendar)
+    is recorded with its error rather than stopping the run.
+
+    returns
+    -------
+        dictionary with the environment and a list of results: {stage, length, seconds, peak_bytes[, error]}
+    '''
+    results = []
+    for length in lengths:
+        for name, (setup, stage) in benchmark_stages(length).items():
+            if stages is not None and name not in stages:
+                continue
+            try:
+                result = dict({"stage": name, "length": length}, **measure(setup, stage, repeats))
+            except Exception as error:
+                result = {"stage": name, "length": length, "seconds": None, "peak_bytes": None,
+                          "error": "%s: %s" % (type(error).__name__, error)}
+            results.append(result)
+            if verbose:
+                print(format_result_(result), flush=True)
+
+    environment = {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+                   "machine": platform.machine()}
+    return {"environment": environment, "results": results}
+
+
+def format_result_(result):
+    if result["seconds"] is None:
+        return "%-35s %9d  %s" % (result["stage"], result["length"], result["error"])
+    return "%-35s %9d  %10.4fs  %10.1f MiB" % (result["stage"], result["length"], result["seconds"],
+                                                result["peak_bytes"] / 2 ** 20)
+
+
+def compare_to_baseline(benchmarks, baseline, threshold=0.2):
+    '''
+    Compares the results against a baseline run.
+
+    returns
+    -------
+        list of the regressions: {stage, length, seconds, baseline_seconds, ratio} where the stage got slower
+        by more than threshold (as a fraction of the baseline time)
+    '''
+    baseline_seconds = {(r["stage"], r["length"]): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    for result in benchmarks["results"]:
+        reference = baseline_seconds.get((result["stage"], result["length"]))
+        if reference is None or result["seconds"] is None:
+            continue
+        ratio = result["seconds"] / reference
+        if ratio > 1 + threshold:
+            regressions.append({"stage": result["stage"], "length": result["length"], "seconds": result["seconds"],
+                                "baseline_seconds": reference, "ratio": ratio})
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the stages of the backtest pipeline.")
+    parser.add_argument("--lengths", type=int, nargs="+", default=DEFAULT_LENGTHS)
+    parser.add_argument("--stages", nargs="+", default=None)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default="benchmarks.json")
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    benchmarks = run_benchmarks(args.lengths, args.stages, args.repeats)
+    with open(args.output, "w") as f:
+        json.dump(benchmarks, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(benchmarks, json.load(f), args.threshold)
+        for regression in regressions:
+            print("REGRESSION %(stage)s at %(length)d: %(seconds).4fs vs %(baseline_seconds).4fs (x%(ratio).2f)"
+                  % regression)
+        sys.exit(1 if regressions else 0)
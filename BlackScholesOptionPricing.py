@@ -10,16 +10,134 @@ File contents:
     Functions:
         call_option_prices
         put_option_prices
+        option_prices
+        call_option_price
+        put_option_price
+        option_greeks
+        implied_volatility
 
 '''
 
-from scipy.stats import norm
-from numpy import sqrt, exp, log, power, max
+from math import erfc
+from numpy import sqrt, exp, log, power, maximum, where, asarray, broadcast_arrays, errstate, float64, pi
+from numpy import full, nan, abs, isfinite, zeros_like
 
 
+# Helper Functions
+# ================
+SQRT_2 = sqrt(2.0)
+_ndtr = None  # scipy.special.ndtr, imported by N on its first array input
+
+
+def N(x):
+    '''
+    Standard normal cumulative distribution function, evaluated element-wise. A single value is evaluated with
+    math.erfc, so scipy is kept off the import path of the single contract pricing.
+    '''
+    global _ndtr
+    if x.ndim == 0:
+        return float64(0.5 * erfc(-float(x) / SQRT_2))
+    if _ndtr is None:
+        from scipy.special import ndtr as _ndtr
+    return _ndtr(x)
+
+
+def n(x):
+    '''Standard normal probability density function, evaluated element-wise.'''
+    return exp(-power(x, 2) / 2) / sqrt(2 * pi)
+
+
+def _broadcast_inputs(*args):
+    '''Converts the pricing inputs to float arrays of a common shape.'''
+    return broadcast_arrays(*[asarray(arg, dtype=float64) for arg in args])
+
+
+def _d1_d2(S, K, tau, r, vol):
+    '''
+    Calculates d1 and d2 for every contract. Expired contracts (tau <= 0) are given a unit tau so that
+    no division errors occur; their values are masked out by the callers.
+
+    returns
+    -------
+        expired, d1, d2
+    '''
+    expired = tau <= 0
+    safe_tau = where(expired, 1.0, tau)
+    vol_sqrt_tau = vol * sqrt(safe_tau)
+    with errstate(divide="ignore", invalid="ignore"):
+        d1 = (log(S / K) + (r + power(vol, 2) / 2) * safe_tau) / vol_sqrt_tau
+    return expired, d1, d1 - vol_sqrt_tau
+
+
+# Vectorized Pricing
+# ==================
+def call_option_prices(spot_price, strike, time_to_expiration, risk_free_rate, volatility):
+    '''
+    Calculates the Black-Scholes European call option prices for arrays of contracts. All inputs are
+    broadcast against each other.
+    :param spot_price: The spot prices of the underlying asset
+    :param strike: The strike prices for the option contracts
+    :param time_to_expiration: The times until expiration given as an annual percent
+    :param risk_free_rate: The rates of a risk-free asset given as an annual percent
+    :param volatility: The volatilities of the underlying asset given as an annual percent
+    :return: np.ndarray of option prices (a scalar if all inputs are scalars)
+    '''
+    S, K, tau, r, vol = _broadcast_inputs(spot_price, strike, time_to_expiration, risk_free_rate, volatility)
+    expired, d1, d2 = _d1_d2(S, K, tau, r, vol)
+
+    # At expiration the price of a call option = max{S-K, 0}
+    present_value_strike = K * exp(-r * tau)
+    prices = where(expired, maximum(S - K, 0), N(d1) * S - N(d2) * present_value_strike)
+    return prices[()]
+
+
+def put_option_prices(spot_price, strike, time_to_expiration, risk_free_rate, volatility):
+    '''
+    Calculates the Black-Scholes European put option prices for arrays of contracts. All inputs are
+    broadcast against each other.
+    :param spot_price: The spot prices of the underlying asset
+    :param strike: The strike prices for the option contracts
+    :param time_to_expiration: The times until expiration given as an annual percent
+    :param risk_free_rate: The rates of a risk-free asset given as an annual percent
+    :param volatility: The volatilities of the underlying asset given as an annual percent
+    :return: np.ndarray of option prices (a scalar if all inputs are scalars)
+    '''
+    S, K, tau, r, vol = _broadcast_inputs(spot_price, strike, time_to_expiration, risk_free_rate, volatility)
+    expired, d1, d2 = _d1_d2(S, K, tau, r, vol)
+
+    # At expiration the price of a put option = max{K-S, 0}
+    present_value_strike = K * exp(-r * tau)
+    prices = where(expired, maximum(K - S, 0), N(-d2) * present_value_strike - N(-d1) * S)
+    return prices[()]
+
+
+def option_prices(spot_price, strike, time_to_expiration, risk_free_rate, volatility, is_call):
+    '''
+    Calculates the Black-Scholes European prices of a mix of call and put contracts in one pass.
+    :param spot_price: The spot prices of the underlying asset
+    :param strike: The strike prices for the option contracts
+    :param time_to_expiration: The times until expiration given as an annual percent
+    :param risk_free_rate: The rates of a risk-free asset given as an annual percent
+    :param volatility: The volatilities of the underlying asset given as an annual percent
+    :param is_call: True for the call contracts, False for the put contracts
+    :return: np.ndarray of option prices (a scalar if all inputs are scalars)
+    '''
+    S, K, tau, r, vol = _broadcast_inputs(spot_price, strike, time_to_expiration, risk_free_rate, volatility)
+    is_call = broadcast_arrays(asarray(is_call, dtype=bool), S)[0]
+    expired, d1, d2 = _d1_d2(S, K, tau, r, vol)
+
+    present_value_strike = K * exp(-r * tau)
+    intrinsic = where(is_call, maximum(S - K, 0), maximum(K - S, 0))
+    call = N(d1) * S - N(d2) * present_value_strike
+    put = N(-d2) * present_value_strike - N(-d1) * S
+    return where(expired, intrinsic, where(is_call, call, put))[()]
+
+
+# Scalar Pricing
+# ==============
 def call_option_price(spot_price, strike, time_to_expiration, risk_free_rate, volatility):
     '''
-    Calculates the Black-Scholes European call option prices.
+    Calculates the Black-Scholes European call option price of a single contract.
     :param spot_price: The spot price of the underlying asset
     :param strike: The strike price for the option contract
     :param time_to_expiration: The time until expiration given as an annual percent
@@ -27,35 +145,12 @@ def call_option_price(spot_price, strike, time_to_expiration, risk_free_rate, vo
     :param volatility: The volatility of the underlying asset given as an annual percent
     :return: price of the option
     '''
-
-    # Helper Functions
-    def N(x):
-        rv = norm()
-        return rv.cdf(x)
-
-    def d1(S, K, tau, r, vol):
-        a = 1/(vol * sqrt(tau))
-        b = log(S / K)
-        c = r + power(vol, 2)/2
-        return a * (b + c*tau)
-
-    def d2(S, K, tau, r, vol):
-        return d1(S, K, tau, r, vol) - vol * sqrt(tau)
-
-    temp_vec = [spot_price, strike, time_to_expiration, risk_free_rate, volatility]
-
-    # If the time to expiration is 0 then d1 will throw an error. It is known that the price of a call
-    # option = max{S-K, 0}
-    if time_to_expiration <= 0:
-        return max([spot_price - strike, 0])
-
-    present_value_strike = strike * exp(-risk_free_rate * time_to_expiration)
-    return N(d1(*temp_vec)) * spot_price - N(d2(*temp_vec)) * present_value_strike
+    return float(call_option_prices(spot_price, strike, time_to_expiration, risk_free_rate, volatility))
 
 
 def put_option_price(spot_price, strike, time_to_expiration, risk_free_rate, volatility):
     '''
-    Calculate the Black-Scholes European put option utilizing put-call paridy
+    Calculates the Black-Scholes European put option price of a single contract.
     :param spot_price: The spot price of the underlying asset
     :param strike: The strike price for the option contract
     :param time_to_expiration: The time until expiration given as an annual percent
@@ -63,10 +158,98 @@ def put_option_price(spot_price, strike, time_to_expiration, risk_free_rate, vol
     :param volatility: The volatility of the underlying asset given as an annual percent
     :return: price of the option
     '''
+    return float(put_option_prices(spot_price, strike, time_to_expiration, risk_free_rate, volatility))
+
+
+# Greeks and Implied Volatility
+# =============================
+def option_greeks(spot_price, strike, time_to_expiration, risk_free_rate, volatility, option_type="call"):
+    '''
+    Calculates the Black-Scholes Greeks for arrays of contracts, sharing d1 and d2 between them. Expired
+    contracts (tau <= 0) have the delta of their intrinsic value and no other sensitivities.
+    :param spot_price: The spot prices of the underlying asset
+    :param strike: The strike prices for the option contracts
+    :param time_to_expiration: The times until expiration given as an annual percent
+    :param risk_free_rate: The rates of a risk-free asset given as an annual percent
+    :param volatility: The volatilities of the underlying asset given as an annual percent
+    :param option_type: Either "call" or "put"
+    :return: dictionary of np.ndarrays with keys: delta, gamma, vega, theta (per year), rho
+    '''
+    S, K, tau, r, vol = _broadcast_inputs(spot_price, strike, time_to_expiration, risk_free_rate, volatility)
+    expired, d1, d2 = _d1_d2(S, K, tau, r, vol)
+
+    sqrt_tau = sqrt(where(expired, 1.0, tau))
+    present_value_strike = K * exp(-r * tau)
+    density = n(d1)
+    with errstate(divide="ignore", invalid="ignore"):
+        gamma = density / (S * vol * sqrt_tau)
+    vega = S * density * sqrt_tau
+    decay = -S * density * vol / (2 * sqrt_tau)
+
+    if option_type == "call":
+        delta = where(expired, (S > K) * 1.0, N(d1))
+        theta = decay - r * present_value_strike * N(d2)
+        rho = tau * present_value_strike * N(d2)
+    else:
+        delta = where(expired, -1.0 * (S < K), N(d1) - 1)
+        theta = decay + r * present_value_strike * N(-d2)
+        rho = -tau * present_value_strike * N(-d2)
+
+    no_sensitivity = zeros_like(S)
+    return {"delta": delta[()],
+            "gamma": where(expired, no_sensitivity, gamma)[()],
+            "vega": where(expired, no_sensitivity, vega)[()],
+            "theta": where(expired, no_sensitivity, theta)[()],
+            "rho": where(expired, no_sensitivity, rho)[()]}
+
+
+def implied_volatility(option_price, spot_price, strike, time_to_expiration, risk_free_rate, option_type="call",
+                       tolerance=1e-8, max_iterations=100, volatility_bounds=(1e-6, 10.0)):
+    '''
+    Solves for the Black-Scholes implied volatility of arrays of contracts. Each contract takes Newton steps
+    on its vega, falling back to bisecting its bracket whenever a step would leave it.
+    :param option_price: The observed option prices
+    :param spot_price: The spot prices of the underlying asset
+    :param strike: The strike prices for the option contracts
+    :param time_to_expiration: The times until expiration given as an annual percent
+    :param risk_free_rate: The rates of a risk-free asset given as an annual percent
+    :param option_type: Either "call" or "put"
+    :param tolerance: The absolute price error at which a contract is solved
+    :param max_iterations: The maximum number of iterations
+    :param volatility_bounds: The initial (low, high) volatility bracket
+    :return: np.ndarray of implied volatilities, NaN where no volatility in the bracket matches the price
+    '''
+    pricing_function = {"call": call_option_prices, "put": put_option_prices}[option_type]
+    price, S, K, tau, r = _broadcast_inputs(option_price, spot_price, strike, time_to_expiration, risk_free_rate)
+
+    low = full(price.shape, volatility_bounds[0])
+    high = full(price.shape, volatility_bounds[1])
+    with errstate(invalid="ignore"):
+        solvable = (tau > 0) & (pricing_function(S, K, tau, r, low) <= price) & \
+                   (price <= pricing_function(S, K, tau, r, high))
+
+    # Brenner-Subrahmanyam approximation as the starting point
+    with errstate(divide="ignore", invalid="ignore"):
+        vol = sqrt(2 * pi / where(tau > 0, tau, 1.0)) * price / S
+    vol = where(isfinite(vol) & (vol > low) & (vol < high), vol, (low + high) / 2)
+    active = solvable.copy()
 
-    present_value_strike = strike * exp(-risk_free_rate * time_to_expiration)
-    temp_vec = [spot_price, strike, time_to_expiration, risk_free_rate, volatility]
-    return present_value_strike - spot_price + call_option_price(*temp_vec)
+    for _ in range(max_iterations):
+        if not active.any():
+            break
+
+        error = pricing_function(S, K, tau, r, vol) - price
+        active &= abs(error) > tolerance
+        high = where(active & (error > 0), vol, high)
+        low = where(active & (error < 0), vol, low)
+
+        d1 = _d1_d2(S, K, tau, r, vol)[1]
+        with errstate(divide="ignore", invalid="ignore", over="ignore"):
+            newton_vol = vol - error / (S * n(d1) * sqrt(tau))
+        in_bracket = isfinite(newton_vol) & (newton_vol > low) & (newton_vol < high)
+        vol = where(active, where(in_bracket, newton_vol, (low + high) / 2), vol)
+
+    return where(solvable, vol, nan)[()]
 
 
 class Option:
@@ -79,13 +262,16 @@ class Option:
     K - Strike Price
     r - Risk-Free Rate (annualized)
     option_type - Type of the option (call or put)
+    instrumentation - Optional Instrumentation object recording every pricing call
+    pricing_cache - Optional PricingCache object in front of the pricing function
 
     attributes
     ----------
     T - Expiration Date (annualized)
     K - Strike Price
     r - Risk-Free Rate (annualized)
-    pricing_function - Option function type (Call or Put)
+    option_type - Type of the option (call or put)
+    pricing_function - Vectorized option function type (Call or Put)
 
     methods
     -------
@@ -94,11 +280,19 @@ class Option:
                 S - Spot price of the underlying asset
                 Vol - The current volatility (annualized)
                 t - Current time
+
+    greeks - * Calculates the Greeks of the option, see option_greeks
+             * Inputs:
+                 S, Vol, t - As for price
     '''
 
-    def __init__(self, T, K, r=0.03, option_type="call"):
-        self.T = T; self.K = K; self.r = r;
-        self.pricing_function = {"call": call_option_price, "put": put_option_price}[option_type]
+    def __init__(self, T, K, r=0.03, option_type="call", instrumentation=None, pricing_cache=None):
+        self.T = T; self.K = K; self.r = r; self.option_type = option_type
+        self.pricing_function = {"call": call_option_prices, "put": put_option_prices}[option_type]
+        if pricing_cache is not None:
+            self.pricing_function = pricing_cache.wrap(self.pricing_function)
+        if instrumentation is not None:
+            self.pricing_function = instrumentation.wrap("option_pricing", self.pricing_function)
 
     def format_tau(self, t):
         '''Annualized percent of time to expiration.'''
@@ -106,4 +300,8 @@ class Option:
 
     def price(self, s, vol, t):
         tau = self.format_tau(t)
-        return self.pricing_function(s, self.K, tau, self.r, vol)
\ No newline at end of file
+        return self.pricing_function(s, self.K, tau, self.r, vol)
+
+    def greeks(self, s, vol, t):
+        tau = self.format_tau(t)
+        return option_greeks(s, self.K, tau, self.r, vol, self.option_type)
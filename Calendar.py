@@ -0,0 +1,102 @@
+'''
+
+Calendar.py
+
+Vectorized builders of trading calendars, expiration schedules, month codes and strike grids, working on
+datetime64[D] arrays instead of looping over date objects.
+
+File contents:
+
+    functions
+    ---------
+        to_days
+        business_days
+        is_third_friday
+        third_fridays
+        weekly_expiries
+        month_codes
+        strike_grid
+
+    constants
+    ---------
+        WEEKDAYS
+
+'''
+
+import datetime as dt
+import numpy as np
+
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def to_days(dates):
+    '''Converts dates (date objects, Timestamps, strings or datetime64) to a datetime64[D] np.ndarray.'''
+    dates = np.asarray(dates)
+    if dates.dtype == object:
+        # Date objects and Timestamps are converted through their list, None becoming NaT
+        return np.array(dates.tolist(), dtype="datetime64[D]")
+    return dates.astype("datetime64[D]")
+
+
+def business_days(n_days, end=None):
+    '''
+    Builds the last n_days weekdays up to end (inclusive when end is a weekday).
+
+    input
+    -----
+        n_days - the number of days
+        end - the last date of the calendar, defaults to today
+
+    returns
+    -------
+        datetime64[D] np.ndarray of the weekdays in ascending order
+    '''
+    end = np.datetime64(dt.date.today() if end is None else end, "D")
+    last_day = np.busday_offset(end, 0, roll="backward")
+    days = np.busday_offset(last_day, np.arange(1 - n_days, 1))
+    # Days before year 1 have no date object, so they would come back as ints from tolist
+    if n_days > 0 and days[0] < np.datetime64(dt.date.min, "D"):
+        raise ValueError("%d weekdays up to %s start before year 1, the earliest date supported" % (n_days, end))
+    return days
+
+
+def is_third_friday(dates):
+    '''Vectorized test of which dates are the third Friday of their month.'''
+    days = to_days(dates)
+    day_of_month = (days - days.astype("datetime64[M]")).astype(np.int64) + 1
+    return np.is_busday(days, weekmask="Fri") & (day_of_month >= 15) & (day_of_month <= 21)
+
+
+def third_fridays(start, end):
+    '''Returns the datetime64[D] np.ndarray of the third Fridays (monthly expirations) from start to end.'''
+    start, end = np.datetime64(start, "D"), np.datetime64(end, "D")
+    months = np.arange(start.astype("datetime64[M]"), end.astype("datetime64[M]") + 1)
+    fridays = np.busday_offset(months.astype("datetime64[D]"), 2, roll="forward", weekmask="Fri")
+    return fridays[(fridays >= start) & (fridays <= end)]
+
+
+def weekly_expiries(start, end, weekday="Fri"):
+    '''Returns the datetime64[D] np.ndarray of every given weekday (weekly expirations) from start to end.'''
+    if weekday not in WEEKDAYS:
+        raise ValueError("weekday must be one of %s, got %r" % (WEEKDAYS, weekday))
+    start, end = np.datetime64(start, "D"), np.datetime64(end, "D")
+    first = np.busday_offset(start, 0, roll="forward", weekmask=weekday)
+    return np.arange(first, end + 1, 7)
+
+
+def month_codes(dates):
+    '''Classifies dates by their month, numbered from January of the first date's year (see get_month_number).'''
+    months = to_days(dates).astype("datetime64[M]").astype(np.int64)
+    if len(months) == 0:
+        return months
+    first_january = months[0] - months[0] % 12
+    return months - first_january + 1
+
+
+def strike_grid(prices, n=1, strike_increment=2.5):
+    '''
+    Returns the strike n strikes below each price (above it for a negative n) on a grid of strikes that are
+    multiples of strike_increment, n = 1 being the closest strike at or below the price.
+    '''
+    return ((np.asarray(prices) // strike_increment) - (n - 1)) * strike_increment
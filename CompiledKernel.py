@@ -0,0 +1,193 @@
+'''
+
+CompiledKernel.py
+
+Compiled path of the single position trade logic: entry, mark-to-market and exit, the Black-Scholes pricing and
+the contract sizing run in one loop over the columnar market data. The loop is compiled with Numba when it is
+installed, and otherwise runs as plain Python with the same results.
+
+File contents:
+
+    functions
+    ---------
+        black_scholes_price
+        size_position
+        trade_state_kernel
+        kernel_inputs
+        run_trade_kernel
+
+    constants
+    ---------
+        NUMBA_AVAILABLE
+        SIZING_RULES
+
+'''
+
+from math import erfc, exp, log, sqrt, floor
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        '''Stands in for numba.njit, leaving the function as plain Python.'''
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
+
+
+# Sizing rules of size_position, the parameter of each being:
+#     percent_cash - percent of the account to keep in cash, as trade_size_logic
+#     fixed_contracts - number of contracts bought on every entry
+#     fixed_notional - amount of cash spent on every entry (capped at the cash available)
+SIZING_RULES = {"percent_cash": 0, "fixed_contracts": 1, "fixed_notional": 2}
+
+NAT = np.iinfo(np.int64).min
+NANOSECONDS_PER_DAY = 86400 * 10 ** 9
+
+
+@njit(cache=True)
+def black_scholes_price(S, K, tau, r, vol, is_call):
+    '''Black-Scholes price of a single contract, the intrinsic value once expired (tau <= 0).'''
+    if tau <= 0:
+        return max(S - K, 0.0) if is_call else max(K - S, 0.0)
+
+    vol_sqrt_tau = vol * sqrt(tau)
+    d1 = (log(S / K) + (r + vol * vol / 2) * tau) / vol_sqrt_tau
+    d2 = d1 - vol_sqrt_tau
+    present_value_strike = K * exp(-r * tau)
+    if is_call:
+        return 0.5 * erfc(-d1 / sqrt(2.0)) * S - 0.5 * erfc(-d2 / sqrt(2.0)) * present_value_strike
+    return 0.5 * erfc(d2 / sqrt(2.0)) * present_value_strike - 0.5 * erfc(d1 / sqrt(2.0)) * S
+
+
+@njit(cache=True)
+def size_position(sizing_rule, sizing_parameter, option_price, cash):
+    '''Number of contracts to buy under one of the SIZING_RULES, none when the option is worthless.'''
+    if not option_price > 0:
+        return 0.0
+    if sizing_rule == 0:
+        return float(((1 - sizing_parameter) * cash) // option_price)
+    elif sizing_rule == 1:
+        return float(sizing_parameter)
+    return float(floor(min(sizing_parameter, cash) / option_price))
+
+
+@njit(cache=True, parallel=True)
+def trade_state_kernel(in_trade, entry, exit_signal, price, volatility, t, opt_t, opt_k, is_call, risk_free_rate,
+                       sizing_rule, sizing_parameter, initial_cash, asset_values, cash_values):
+    '''
+    Runs trade_logic_step and its Account over every day of every path, see run_trade_kernel. The paths are
+    independent and run in parallel when compiled.
+
+    inputs
+    ------
+        in_trade, entry, exit_signal - bool np.ndarrays (days x paths)
+        price, volatility, opt_k - float np.ndarrays (days x paths)
+        t, opt_t - int64 np.ndarrays (days) of the days and their expirations as nanoseconds (NAT when none)
+        is_call, risk_free_rate, sizing_rule, sizing_parameter, initial_cash - scalars
+        asset_values, cash_values - float np.ndarrays (days x paths) the results are written to
+    '''
+    n_days, n_paths = price.shape
+    for path in prange(n_paths):
+        cash = initial_cash
+        asset = np.nan
+        holding = False
+        strike = 0.0
+        expiry = 0
+        num_contracts = 0.0
+
+        for day in range(n_days):
+            if in_trade[day, path]:
+                if entry[day, path] and opt_t[day] != NAT:
+                    strike = opt_k[day, path]
+                    expiry = opt_t[day]
+                    tau = ((expiry - t[day]) // NANOSECONDS_PER_DAY) / 365
+                    option_price = black_scholes_price(price[day, path], strike, tau, risk_free_rate,
+                                                       volatility[day, path], is_call)
+                    num_contracts = size_position(sizing_rule, sizing_parameter, option_price, cash)
+                    current_asset_value = option_price * num_contracts
+                    cash = cash - current_asset_value
+                    asset = asset + current_asset_value if holding else current_asset_value
+                    holding = True
+
+                elif holding:
+                    tau = ((expiry - t[day]) // NANOSECONDS_PER_DAY) / 365
+                    option_price = black_scholes_price(price[day, path], strike, tau, risk_free_rate,
+                                                       volatility[day, path], is_call)
+                    if exit_signal[day, path]:
+                        cash = cash + option_price * num_contracts
+                        asset = np.nan
+                        holding = False
+                    else:
+                        asset = option_price * num_contracts
+
+            asset_values[day, path] = asset
+            cash_values[day, path] = cash
+
+
+def to_nanoseconds_(dates):
+    '''Converts dates (date objects, Timestamps or datetime64, None for missing) to int64 nanoseconds.'''
+    dates = np.asarray(dates)
+    if dates.dtype.kind != "M":
+        dates = np.asarray(pd.to_datetime(dates.tolist()), dtype="datetime64[ns]")
+    return dates.astype("datetime64[ns]").view(np.int64)
+
+
+def kernel_inputs(market_data):
+    '''
+    Converts expanded market data to the arrays of trade_state_kernel.
+
+    input
+    -----
+        market_data - pd.DataFrame from expand_market_data, or the dictionary of expand_market_arrays
+                      (or expand_market_paths)
+
+    returns
+    -------
+        in_trade, entry, exit_signal, price, volatility, t, opt_t, opt_k
+    '''
+    def column(name, dtype):
+        values = market_data[name]
+        values = values.to_numpy() if isinstance(values, pd.Series) else np.asarray(values)
+        values = np.asarray(values, dtype=dtype)
+        return np.ascontiguousarray(values.reshape(len(values), -1))
+
+    flags = [column(name, np.bool_) for name in ["In_trade", "Entry", "Exit"]]
+    floats = [column(name, np.float64) for name in ["Price", "Volatility"]]
+    dates = [to_nanoseconds_(np.asarray(market_data[name])) for name in ["t", "Opt_T"]]
+    return (*flags, *floats, *dates, column("Opt_K", np.float64))
+
+
+def run_trade_kernel(market_data, option_type, sizing_rule="percent_cash", sizing_parameter=0.9,
+                     initial_cash=50000, risk_free_rate=0.03):
+    '''
+    Runs the single position trade logic over expanded market data with the compiled kernel.
+
+    input
+    -----
+        market_data - expanded market data, see kernel_inputs
+        option_type - either "put" or "call"
+        sizing_rule - one of SIZING_RULES
+        sizing_parameter - the parameter of the sizing rule
+        initial_cash - the amount of cash each path starts with
+        risk_free_rate - the rate of a risk-free asset given as an annual percent
+
+    returns
+    -------
+        asset_values, cash_values - np.ndarrays (days x paths), asset values are NaN when no asset is held
+    '''
+    if sizing_rule not in SIZING_RULES:
+        raise ValueError("Unknown sizing rule %r, expected one of %s" % (sizing_rule, list(SIZING_RULES)))
+
+    inputs = kernel_inputs(market_data)
+    asset_values = np.empty(inputs[3].shape)
+    cash_values = np.empty(inputs[3].shape)
+    trade_state_kernel(*inputs, option_type == "call", float(risk_free_rate), SIZING_RULES[sizing_rule],
+                       float(sizing_parameter), float(initial_cash), asset_values, cash_values)
+    return asset_values, cash_values
@@ -0,0 +1,91 @@
+'''
+
+FeatureCache.py
+
+File contents:
+
+    classes
+    -------
+        FeatureCache
+
+    functions
+    ---------
+        fingerprint
+
+'''
+
+from collections import OrderedDict
+from hashlib import sha1
+import threading
+from pandas.util import hash_pandas_object
+
+
+def fingerprint(series):
+    '''Returns a hash of the values and index of a pd.Series, used to recognise the same data across backtests.'''
+    return sha1(hash_pandas_object(series, index=True).to_numpy().tobytes()).hexdigest()
+
+
+class FeatureCache:
+    '''
+    Bounded least-recently-used cache of computed market data features. It can be shared between threads
+    (e.g. the jobs of a BacktestService): the lookups are locked, while features are computed outside the
+    lock, so two threads missing the same key at once both compute it.
+
+    initial inputs
+    --------------
+    maxsize - The maximum number of features held before the least recently used one is evicted
+
+    attributes
+    ----------
+    hits - The number of lookups that were served from the cache
+    misses - The number of lookups that had to compute the feature
+
+    methods
+    -------
+    get - * Returns the cached feature for a key, computing and storing it on a miss
+          * Inputs:
+              key, compute_function, *args
+
+    clear - * Removes every feature and resets the statistics
+
+    fingerprint - * Returns the fingerprint of a pd.Series used in the feature keys
+    '''
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._features = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._features)
+
+    def get(self, key, compute_function, *args):
+        '''Cached features are shared between backtests and must not be modified in place.'''
+        with self._lock:
+            if key in self._features:
+                self.hits += 1
+                self._features.move_to_end(key)
+                return self._features[key]
+            self.misses += 1
+
+        feature = compute_function(*args)
+        with self._lock:
+            self._features[key] = feature
+            if len(self._features) > self.maxsize:
+                self._features.popitem(last=False)
+        return feature
+
+    def fingerprint(self, series):
+        return fingerprint(series)
+
+    def clear(self):
+        with self._lock:
+            self._features.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Cache shared by every Backtest in the process unless another one is given
+default_feature_cache = FeatureCache()
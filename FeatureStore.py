@@ -0,0 +1,158 @@
+'''
+
+FeatureStore.py
+
+File contents:
+
+    classes
+    -------
+        FeatureStore
+
+'''
+
+import json
+import os
+from hashlib import sha1
+import numpy as np
+import pandas as pd
+from FeatureCache import fingerprint
+
+
+class FeatureStore:
+    '''
+    On-disk store of a price history and the features derived from it. Arrays are kept as .npy files and
+    memory-mapped when read, so later runs neither recompute the features nor read them fully into memory.
+
+    The store has the same get/fingerprint interface as FeatureCache and can be given to expand_market_data
+    (or Backtest) as its feature_cache.
+
+    initial inputs
+    --------------
+    directory - The directory holding the store, created if it does not exist
+
+    attributes
+    ----------
+    metadata - Dictionary holding the price fingerprint and the layout of every stored feature
+
+    methods
+    -------
+    write_prices - * Stores a price history, replacing the one held along with its features
+                   * Inputs:
+                       price_series - pd.Series of asset prices indexed by date
+
+    import_parquet - * Stores the price history of a Parquet file (requires pyarrow or fastparquet)
+                     * Inputs:
+                         path, price_column, date_column - date_column defaults to the file's index
+
+    import_npy - * Stores the price history of .npy files of prices and dates
+                 * Inputs:
+                     prices_path, dates_path
+
+    load_prices - * Returns the memory-mapped price history as a pd.Series
+
+    get - * Returns the stored feature for a key, computing and storing it when missing
+          * Inputs:
+              key, compute_function, *args
+    '''
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, "features"), exist_ok=True)
+        self.prices_ = None
+
+        metadata_path = os.path.join(directory, "metadata.json")
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                self.metadata = json.load(f)
+        else:
+            self.metadata = {"fingerprint": None, "features": {}}
+
+    def path_(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    def save_array_(self, path, array):
+        # Written to a temporary file first so that concurrent readers never see a partial array
+        temp_path = path + ".tmp.npy"
+        np.save(temp_path, array)
+        os.replace(temp_path, path)
+
+    def save_metadata_(self):
+        temp_path = self.path_("metadata.json.tmp")
+        with open(temp_path, "w") as f:
+            json.dump(self.metadata, f)
+        os.replace(temp_path, self.path_("metadata.json"))
+
+    def write_prices(self, price_series):
+        dates = np.asarray(pd.to_datetime(price_series.index), dtype="datetime64[ns]")
+        self.save_array_(self.path_("dates.npy"), dates)
+        self.save_array_(self.path_("prices.npy"), price_series.to_numpy(dtype=np.float64))
+
+        for file_name in self.metadata["features"]:
+            os.remove(self.path_("features", file_name))
+        self.metadata = {"fingerprint": None, "features": {}}
+        self.prices_ = None
+        self.metadata["fingerprint"] = fingerprint(self.load_prices())
+        self.save_metadata_()
+
+    def import_parquet(self, path, price_column="Price", date_column=None):
+        data = pd.read_parquet(path)
+        if date_column is not None:
+            data = data.set_index(date_column)
+        self.write_prices(data[price_column])
+
+    def import_npy(self, prices_path, dates_path):
+        self.write_prices(pd.Series(np.load(prices_path), index=pd.DatetimeIndex(np.load(dates_path))))
+
+    def load_prices(self):
+        if self.prices_ is None:
+            prices = np.load(self.path_("prices.npy"), mmap_mode="r")
+            dates = pd.DatetimeIndex(np.load(self.path_("dates.npy"), mmap_mode="r"))
+            self.prices_ = pd.Series(prices, index=dates, copy=False)
+        return self.prices_
+
+    def fingerprint(self, series):
+        '''The stored fingerprint is reused for the store's own prices instead of reading them again.'''
+        if series is self.prices_ and self.metadata["fingerprint"] is not None:
+            return self.metadata["fingerprint"]
+        return fingerprint(series)
+
+    def get(self, key, compute_function, *args):
+        '''Stored features are memory-mapped read-only and must not be modified in place.'''
+        if key[0] is None or key[0] != self.metadata["fingerprint"]:
+            # Only the features of the stored price history are kept
+            return compute_function(*args)
+
+        file_name = "%s_%s.npy" % (key[1], sha1(repr(key).encode()).hexdigest()[:16])
+        if file_name not in self.metadata["features"]:
+            self.save_feature_(file_name, compute_function(*args))
+
+        # Always read back from disk so a feature looks the same whether it was just computed or not
+        return self.load_feature_(file_name, self.metadata["features"][file_name])
+
+    def save_feature_(self, file_name, feature):
+        if isinstance(feature, pd.DataFrame):
+            layout = {"kind": "frame", "columns": list(feature.columns)}
+            values = feature.to_numpy()
+        elif isinstance(feature, pd.Series):
+            layout = {"kind": "series"}
+            values = feature.to_numpy()
+        else:
+            layout = {"kind": "array"}
+            values = np.asarray(feature)
+
+        # Columns of date objects (e.g. Opt_T) are stored as datetime64, None becoming NaT
+        if values.dtype == object:
+            values = np.asarray(pd.to_datetime(values.ravel()), dtype="datetime64[ns]").reshape(values.shape)
+
+        self.save_array_(self.path_("features", file_name), values)
+        self.metadata["features"][file_name] = layout
+        self.save_metadata_()
+
+    def load_feature_(self, file_name, layout):
+        values = np.load(self.path_("features", file_name), mmap_mode="r")
+        index = self.load_prices().index
+        if layout["kind"] == "frame":
+            return pd.DataFrame(values, index=index, columns=layout["columns"], copy=False)
+        elif layout["kind"] == "series":
+            return pd.Series(values, index=index, copy=False)
+        return values
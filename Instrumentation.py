@@ -0,0 +1,81 @@
+'''
+
+Instrumentation.py
+
+File contents:
+
+    classes
+    -------
+        Instrumentation
+
+'''
+
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+import time
+import tracemalloc
+
+
+class Instrumentation:
+    '''
+    Records the wall time, call count and allocation delta of named sections of a run.
+
+    initial inputs
+    --------------
+    track_allocations - Whether to record the net memory allocated by each section. This starts tracemalloc,
+                        which slows the run down noticeably, so it is off by default.
+
+    attributes
+    ----------
+    calls, seconds, allocated_bytes - Dictionaries of section name to its totals
+
+    methods
+    -------
+    measure - * Context manager recording one call of a section
+              * Inputs:
+                  name
+
+    wrap - * Returns a function that records every call of function under name
+           * Inputs:
+               name, function
+
+    report - * Returns a pd.DataFrame of the totals of every section
+    '''
+
+    def __init__(self, track_allocations=False):
+        self.track_allocations = track_allocations
+        self.calls = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self.allocated_bytes = defaultdict(int)
+        if track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def measure(self, name):
+        allocated = tracemalloc.get_traced_memory()[0] if self.track_allocations else 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+            self.calls[name] += 1
+            if self.track_allocations:
+                self.allocated_bytes[name] += tracemalloc.get_traced_memory()[0] - allocated
+
+    def wrap(self, name, function):
+        @wraps(function)
+        def measured_function(*args, **kwargs):
+            with self.measure(name):
+                return function(*args, **kwargs)
+        return measured_function
+
+    def report(self):
+        '''Sections are sorted by total time, nested sections are included in their parent's time.'''
+        import pandas as pd  # Only needed for the report, so runs that are not reported never import it
+        report = pd.DataFrame({"Calls": pd.Series(self.calls, dtype="int64"),
+                               "TotalSeconds": pd.Series(self.seconds, dtype="float64")})
+        report["MeanSeconds"] = report.TotalSeconds / report.Calls
+        if self.track_allocations:
+            report["AllocatedBytes"] = pd.Series(self.allocated_bytes, dtype="int64")
+        return report.sort_values("TotalSeconds", ascending=False)
@@ -0,0 +1,153 @@
+'''
+
+MarketPanel.py
+
+File contents:
+
+    classes
+    -------
+        PanelBacktest
+
+    functions
+    ---------
+        to_price_panel
+        expand_market_panel
+
+'''
+
+import numpy as np
+import pandas as pd
+from BlackScholesOptionPricing import option_prices
+from Calendar import to_days
+from Portfolio import Portfolio
+from SignalCreation import expand_market_arrays
+
+
+def to_price_panel(prices):
+    '''
+    Aligns the prices of many underlying assets on one sorted date index.
+
+    input
+    -----
+        prices - wide pd.DataFrame (dates x tickers) or dictionary of ticker to pd.Series
+
+    returns
+    -------
+        pd.DataFrame (dates x tickers) of float prices, gaps after a ticker's first price are forward filled
+    '''
+    if isinstance(prices, dict):
+        prices = pd.concat(prices, axis=1)
+    return prices.sort_index().astype(np.float64).ffill()
+
+
+def expand_market_panel(prices, option_type, moving_average_lag, exp_series, min_days_to_expiry=90,
+                        n_strikes_away=1, volatility_window=20, dtype=np.float32, strike_increment=2.5):
+    '''
+    Expands a panel of underlying assets into compact columnar market data with one column per ticker, see
+    expand_market_arrays. The tickers are kept under the "tickers" entry.
+    '''
+    panel = to_price_panel(prices)
+    market_data = expand_market_arrays(panel.to_numpy(), panel.index, option_type, moving_average_lag, exp_series,
+                                       min_days_to_expiry, n_strikes_away, volatility_window, dtype, strike_increment)
+    market_data["tickers"] = list(panel.columns)
+    return market_data
+
+
+class PanelBacktest:
+    '''
+    Runs the strategy over a universe of underlying assets trading from one shared Portfolio.
+
+    attributes
+    ----------
+        market_data - Columnar expanded market data of every ticker, see expand_market_panel
+        portfolio - Portfolio holding the positions of every ticker
+        account_data - Account object shared by every ticker
+        trade_size_logic - Function to determine the number of contracts to trade
+        trade_journal - np.ndarray (days x JOURNAL_COLUMNS) of the asset, cash, and total value of the account
+        cost_model - Optional CostModel charging the execution costs of every entry and exit
+
+    methods
+    -------
+        run_backtest - runs the backtest
+        export_results_as_df - returns a pd.DataFrame object of the trade_journal
+    '''
+
+    JOURNAL_COLUMNS = ["AssetValue", "CashValue", "PortfolioValue"]
+
+    def __init__(self, prices, trade_size_logic, option_type, expiry_series, ma_lag=200, min_days_to_expiry=90,
+                 n_strikes_away=1, volatility_window=20, risk_free_rate=0.03, dtype=np.float32, cost_model=None,
+                 strike_increment=2.5):
+        self.market_data = expand_market_panel(prices, option_type, ma_lag, expiry_series, min_days_to_expiry,
+                                               n_strikes_away, volatility_window, dtype, strike_increment)
+        self.portfolio = Portfolio(underlyings=self.market_data["tickers"])
+        self.account_data = self.portfolio.account_data
+        self.trade_size_logic = trade_size_logic
+        self.option_type = option_type
+        self.expiry_series = expiry_series
+        self.risk_free_rate = risk_free_rate
+        self.cost_model = cost_model
+        self.trade_journal = np.full((len(self.market_data["index"]), len(self.JOURNAL_COLUMNS)), np.nan)
+
+    def run_backtest(self):
+        md = self.market_data  # Short form to help make code fit
+        is_call = self.option_type == "call"
+
+        for day in range(len(md["index"])):
+            prices, volatility = md["Price"][day], md["Volatility"][day]
+
+            if len(self.portfolio) > 0:
+                # Mark every position to market with one pricing call, then close the exiting tickers
+                held_prices = self.portfolio.mark_to_market(prices, volatility, md["t"][day])
+                exiting = (md["In_trade"][day] & md["Exit"][day])[self.portfolio["underlying"]]
+                if exiting.any():
+                    self.portfolio.close_positions(exiting, self.exit_cost_(exiting, held_prices, day))
+
+            entering = np.flatnonzero(md["In_trade"][day] & md["Entry"][day])
+            if len(entering) > 0:
+                tau = (md["Opt_T"][day] - md["t"][day]).astype(np.float64) / 365
+                strikes = md["Opt_K"][day][entering]
+                entry_prices = np.atleast_1d(option_prices(prices[entering], strikes, tau, self.risk_free_rate,
+                                                           volatility[entering], is_call))
+                unit_costs = np.zeros(len(entering))
+                if self.cost_model is not None:
+                    unit_costs = np.atleast_1d(self.cost_model.costs(prices[entering], strikes, tau,
+                                                                     self.risk_free_rate, volatility[entering],
+                                                                     is_call, 1, 1, entry_prices))
+
+                # Contracts are sized one ticker at a time since every entry spends the shared cash, on their
+                # price including the execution costs
+                for ticker, strike, option_price, unit_cost in zip(entering, strikes, entry_prices, unit_costs):
+                    num_contracts = self.trade_size_logic(option_price + unit_cost, self.account_data)
+                    self.portfolio.open_position(ticker, self.option_type, strike, md["Opt_T"][day],
+                                                 num_contracts, option_price, self.risk_free_rate,
+                                                 unit_cost * num_contracts)
+
+            self.update_trade_journal(day)
+
+    def exit_cost_(self, exiting, held_prices, day):
+        '''Execution cost of closing the exiting positions at their marked prices, nothing without a cost_model.'''
+        if self.cost_model is None:
+            return 0.0
+
+        md = self.market_data
+        underlying = self.portfolio["underlying"][exiting]
+        tau = (self.portfolio["expiry"][exiting] - to_days(md["t"][day])).astype(np.float64) / 365
+        costs = self.cost_model.costs(md["Price"][day][underlying], self.portfolio["strike"][exiting], tau,
+                                      self.portfolio["rate"][exiting], md["Volatility"][day][underlying],
+                                      self.portfolio["is_call"][exiting], self.portfolio["num_contracts"][exiting],
+                                      -1, held_prices[exiting])
+        return float(np.sum(costs))
+
+    def update_trade_journal(self, i):
+        a_value = self.account_data.asset_value
+        c_value = self.account_data.cash_value
+
+        if a_value is None:
+            self.trade_journal[i] = (np.nan, c_value, c_value)
+        else:
+            self.trade_journal[i] = (a_value, c_value, c_value + a_value)
+
+    def export_results_as_df(self):
+        '''Returns a pd.DataFrame view of the trade_journal, without copying it.'''
+        return pd.DataFrame(self.trade_journal, index=self.market_data["index"], columns=self.JOURNAL_COLUMNS,
+                            copy=False)
@@ -0,0 +1,216 @@
+'''
+
+Metrics.py
+
+Vectorized performance metrics of backtest results. Every function takes the values of a single run as a 1-d
+np.ndarray (days) or of many runs stacked as a 2-d np.ndarray (days x runs), as the asset_values and
+cash_values of MonteCarloBacktest, and computes the metrics of every run in one pass.
+
+File contents:
+
+    functions
+    ---------
+        daily_returns
+        sharpe_ratios
+        sortino_ratios
+        drawdowns
+        max_drawdowns
+        exposures
+        trade_pnls
+        performance_metrics
+        journal_metrics
+
+    constants
+    ---------
+        PERIODS_PER_YEAR
+        METRIC_COLUMNS
+
+'''
+
+import numpy as np
+import pandas as pd
+
+
+PERIODS_PER_YEAR = 252
+
+METRIC_COLUMNS = ["FinalValue", "TotalReturn", "AnnualReturn", "AnnualVolatility", "SharpeRatio", "SortinoRatio",
+                  "MaxDrawdown", "MaxDrawdownDuration", "Trades", "WinRate", "AverageTradePnL", "Exposure"]
+
+
+def as_runs_(values):
+    '''Returns values as a float np.ndarray (days x runs), a single run becoming one column.'''
+    values = np.asarray(values, dtype=float)
+    return values.reshape(len(values), -1)
+
+
+def ratio_(numerator, denominator):
+    '''Element-wise numerator / denominator, NaN where the denominator is 0.'''
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator != 0, numerator / denominator, np.nan)
+
+
+def daily_returns(portfolio_values):
+    '''
+    Returns the simple returns from one day to the next, np.ndarray (days - 1) or (days - 1 x runs).
+    '''
+    portfolio_values = np.asarray(portfolio_values, dtype=float)
+    return portfolio_values[1:] / portfolio_values[:-1] - 1
+
+
+def sharpe_ratios(portfolio_values, risk_free_rate=0.03, periods_per_year=PERIODS_PER_YEAR):
+    '''
+    Annualized Sharpe ratio of every run: the mean daily return in excess of the risk-free rate over its
+    standard deviation.
+
+    input
+    -----
+        portfolio_values - np.ndarray (days) or (days x runs) of portfolio values
+        risk_free_rate - the rate of a risk-free asset given as an annual percent
+        periods_per_year - the number of days in a year of the values
+
+    returns
+    -------
+        np.ndarray (runs) of Sharpe ratios, NaN when the returns do not vary
+    '''
+    excess_returns = daily_returns(as_runs_(portfolio_values)) - risk_free_rate / periods_per_year
+    return ratio_(excess_returns.mean(axis=0), excess_returns.std(axis=0, ddof=1)) * np.sqrt(periods_per_year)
+
+
+def sortino_ratios(portfolio_values, risk_free_rate=0.03, periods_per_year=PERIODS_PER_YEAR):
+    '''
+    Annualized Sortino ratio of every run: the mean daily return in excess of the risk-free rate over its
+    downside deviation, see sharpe_ratios.
+    '''
+    excess_returns = daily_returns(as_runs_(portfolio_values)) - risk_free_rate / periods_per_year
+    downside_deviation = np.sqrt((np.minimum(excess_returns, 0) ** 2).mean(axis=0))
+    return ratio_(excess_returns.mean(axis=0), downside_deviation) * np.sqrt(periods_per_year)
+
+
+def drawdowns(portfolio_values):
+    '''Returns the fraction of its running peak every portfolio value is below, in the shape of the values.'''
+    portfolio_values = np.asarray(portfolio_values, dtype=float)
+    return 1 - portfolio_values / np.maximum.accumulate(portfolio_values, axis=0)
+
+
+def max_drawdowns(portfolio_values):
+    '''
+    Deepest and longest drawdown of every run.
+
+    input
+    -----
+        portfolio_values - np.ndarray (days) or (days x runs) of portfolio values
+
+    returns
+    -------
+        max_drawdown - np.ndarray (runs) of the largest fraction of a peak lost
+        max_duration - np.ndarray (runs) of the most days spent below a previous peak, including a drawdown
+                       still running on the last day
+    '''
+    portfolio_values = as_runs_(portfolio_values)
+    days = np.arange(len(portfolio_values))[:, None]
+    underwater = portfolio_values < np.maximum.accumulate(portfolio_values, axis=0)
+    # Day of the latest peak before every day, the duration being the days since then
+    peak_days = np.maximum.accumulate(np.where(underwater, 0, days), axis=0)
+    return drawdowns(portfolio_values).max(axis=0), (days - peak_days).max(axis=0)
+
+
+def exposures(asset_values):
+    '''Returns the fraction of days a position is held in every run, asset values being NaN when none is.'''
+    return (~np.isnan(as_runs_(asset_values))).mean(axis=0)
+
+
+def trade_pnls(portfolio_values, asset_values, index=None):
+    '''
+    Profit and loss of every closed trade. A trade runs from the first day a position is held to the first day
+    none is, entries while a position is held adding to the trade. Its profit is the change of the portfolio
+    value from the day before the entry (the entry day for a trade entered on the first day) to the exit day,
+    so that the execution costs are included. Trades still open on the last day are left out.
+
+    input
+    -----
+        portfolio_values - np.ndarray (days) or (days x runs) of portfolio values
+        asset_values - np.ndarray of the same shape of asset values, NaN when no position is held
+        index - optional index of the days (e.g. the journal's dates) the entry and exit days are taken from
+
+    returns
+    -------
+        pd.DataFrame with one row per trade and columns:
+            [Run, Entry, Exit, PnL, Return]
+    '''
+    portfolio_values = as_runs_(portfolio_values)
+    holding = ~np.isnan(as_runs_(asset_values))
+    held_before = np.vstack([np.zeros((1, holding.shape[1]), dtype=bool), holding[:-1]])
+
+    # Entries and exits in the order of their run and then day, the k-th exit of a run closing its k-th entry
+    entry_runs, entry_days = np.nonzero((holding & ~held_before).T)
+    exit_runs, exit_days = np.nonzero((~holding & held_before).T)
+    last_entry = np.append(entry_runs[1:] != entry_runs[:-1], True)
+    closed = ~(last_entry & holding[-1][entry_runs])
+    entry_runs, entry_days = entry_runs[closed], entry_days[closed]
+
+    start_values = portfolio_values[np.maximum(entry_days - 1, 0), entry_runs]
+    pnls = portfolio_values[exit_days, exit_runs] - start_values
+    if index is not None:
+        entry_days, exit_days = np.asarray(index)[entry_days], np.asarray(index)[exit_days]
+    return pd.DataFrame({"Run": exit_runs, "Entry": entry_days, "Exit": exit_days, "PnL": pnls,
+                         "Return": ratio_(pnls, start_values)})
+
+
+def performance_metrics(portfolio_values, asset_values=None, risk_free_rate=0.03,
+                        periods_per_year=PERIODS_PER_YEAR):
+    '''
+    Computes the metrics of every run at once.
+
+    input
+    -----
+        portfolio_values - np.ndarray (days) or (days x runs) of portfolio values
+        asset_values - optional np.ndarray of the same shape of asset values, NaN when no position is held, to
+                       compute the trade metrics and the exposure
+        risk_free_rate - the rate of a risk-free asset given as an annual percent
+        periods_per_year - the number of days in a year of the values
+
+    returns
+    -------
+        pd.DataFrame with one row per run and the METRIC_COLUMNS, the trade metrics and exposure being NaN
+        without asset values
+    '''
+    portfolio_values = as_runs_(portfolio_values)
+    n_days, n_runs = portfolio_values.shape
+    total_returns = portfolio_values[-1] / portfolio_values[0] - 1
+    max_drawdown, max_duration = max_drawdowns(portfolio_values)
+
+    metrics = {"FinalValue": portfolio_values[-1],
+               "TotalReturn": total_returns,
+               "AnnualReturn": (1 + total_returns) ** (periods_per_year / max(n_days - 1, 1)) - 1,
+               "AnnualVolatility": daily_returns(portfolio_values).std(axis=0, ddof=1) * np.sqrt(periods_per_year),
+               "SharpeRatio": sharpe_ratios(portfolio_values, risk_free_rate, periods_per_year),
+               "SortinoRatio": sortino_ratios(portfolio_values, risk_free_rate, periods_per_year),
+               "MaxDrawdown": max_drawdown,
+               "MaxDrawdownDuration": max_duration}
+
+    if asset_values is None:
+        metrics.update({name: np.full(n_runs, np.nan) for name in ["Trades", "WinRate", "AverageTradePnL",
+                                                                   "Exposure"]})
+    else:
+        trades = trade_pnls(portfolio_values, asset_values)
+        n_trades = np.bincount(trades.Run, minlength=n_runs)
+        metrics["Trades"] = n_trades
+        metrics["WinRate"] = ratio_(np.bincount(trades.Run, weights=trades.PnL > 0, minlength=n_runs), n_trades)
+        metrics["AverageTradePnL"] = ratio_(np.bincount(trades.Run, weights=trades.PnL, minlength=n_runs),
+                                            n_trades)
+        metrics["Exposure"] = exposures(asset_values)
+
+    return pd.DataFrame(metrics, columns=METRIC_COLUMNS)
+
+
+def journal_metrics(results, risk_free_rate=0.03, periods_per_year=PERIODS_PER_YEAR):
+    '''
+    Computes the metrics of a trade journal from Backtest.export_results_as_df.
+
+    returns
+    -------
+        dictionary of the METRIC_COLUMNS, see performance_metrics
+    '''
+    metrics = performance_metrics(results.PortfolioValue.to_numpy(dtype=float),
+                                  results.AssetValue.to_numpy(dtype=float), risk_free_rate, periods_per_year)
+    return metrics.iloc[0].to_dict()
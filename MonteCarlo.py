@@ -0,0 +1,227 @@
+'''
+
+MonteCarlo.py
+
+File contents:
+
+    classes
+    -------
+        MonteCarloBacktest
+
+    functions
+    ---------
+        expand_market_paths
+        run_batch_trade_logic
+        summarize_portfolio_values
+
+'''
+
+import numpy as np
+import pandas as pd
+from BlackScholesOptionPricing import call_option_prices, put_option_prices
+from Metrics import performance_metrics
+from SignalCreation import expand_market_arrays
+from TradeLogic import batch_trade_size_logic
+
+
+def expand_market_paths(price_paths, option_type, moving_average_lag, exp_series,
+                        min_days_to_expiry=90, n_strikes_away=1, volatility_window=20, strike_increment=2.5):
+    '''
+    Expands many price paths at once into the columnar market data used by run_batch_trade_logic, see
+    expand_market_arrays.
+
+    input
+    -----
+        price_paths - pd.DataFrame of asset prices with one row per path and one column per date
+        option_type - either "put" or "call"
+        moving_average_lag - parameter for the moving average lag
+        exp_series - pd.Series of option expiration dates
+        min_days_to_expiry, n_strikes_away, volatility_window, strike_increment - see expand_market_arrays
+
+    returns
+    -------
+        market_data - dictionary of columnar market data with one column per path
+    '''
+    return expand_market_arrays(price_paths.to_numpy(dtype=float).T, price_paths.columns, option_type,
+                                moving_average_lag, exp_series, min_days_to_expiry, n_strikes_away, volatility_window,
+                                strike_increment=strike_increment)
+
+
+def run_batch_trade_logic(market_data, option_type, trade_size_logic=batch_trade_size_logic,
+                          initial_cash=50000, risk_free_rate=0.03, pricing_cache=None, cost_model=None):
+    '''
+    Runs trade_logic for every path at once. The days are stepped through in order, while the entries,
+    updates and exits of all paths on a day are handled with one vectorized pricing call.
+
+    input
+    -----
+        market_data - dictionary of columnar market data, see expand_market_paths
+        option_type - either "put" or "call"
+        trade_size_logic - vectorized sizing function f(option_prices, cash_values)
+        initial_cash - the amount of cash each path starts with
+        risk_free_rate - the rate of a risk-free asset given as an annual percent
+        pricing_cache - optional PricingCache, letting reruns over the same paths skip the daily pricing calls
+        cost_model - optional CostModel charging the execution costs of the entries and exits of every path
+
+    returns
+    -------
+        asset_values, cash_values - np.ndarrays (days x paths), asset values are NaN when no asset is held
+    '''
+    pricing_function = {"call": call_option_prices, "put": put_option_prices}[option_type]
+    if pricing_cache is not None:
+        pricing_function = pricing_cache.wrap(pricing_function)
+    prices, volatility = market_data["Price"], market_data["Volatility"]
+    entries, exits, in_trades = market_data["Entry"], market_data["Exit"], market_data["In_trade"]
+    t, opt_t, opt_k = market_data["t"], market_data["Opt_T"], market_data["Opt_K"]
+    n_days, n_paths = prices.shape
+
+    # Account state of every path
+    cash = np.full(n_paths, float(initial_cash))
+    asset = np.full(n_paths, np.nan)
+    holding = np.zeros(n_paths, dtype=bool)
+    strikes = np.full(n_paths, np.nan)
+    expiries = np.zeros(n_paths, dtype="datetime64[D]")
+    num_contracts = np.zeros(n_paths)
+
+    asset_values = np.empty((n_days, n_paths))
+    cash_values = np.empty((n_days, n_paths))
+
+    for day in range(n_days):
+        entering = in_trades[day] & entries[day]
+        updating = in_trades[day] & ~entries[day] & holding
+
+        strikes[entering] = opt_k[day][entering]
+        expiries[entering] = opt_t[day]
+
+        active = np.flatnonzero(entering | updating)
+        if len(active) > 0:
+            tau = (expiries[active] - t[day]).astype(float) / 365
+            option_prices = np.full(n_paths, np.nan)
+            option_prices[active] = pricing_function(prices[day][active], strikes[active], tau,
+                                                     risk_free_rate, volatility[day][active])
+
+            # Entering a position, sized on the option prices including the execution costs
+            unit_costs = np.zeros(n_paths)
+            exiting = updating & exits[day]
+            if cost_model is not None:
+                unit_costs[entering] = path_costs_(cost_model, entering, 1, prices[day], strikes, expiries, t[day],
+                                                   risk_free_rate, volatility[day], option_type, 1, option_prices)
+            num_contracts[entering] = trade_size_logic(option_prices[entering] + unit_costs[entering], cash[entering])
+            current_asset_value = option_prices * num_contracts
+            cash[entering] = cash[entering] - current_asset_value[entering]
+            if cost_model is not None:
+                cash[entering] -= (unit_costs * num_contracts)[entering]
+            if cost_model is not None and exiting.any():
+                cash[exiting] -= path_costs_(cost_model, exiting, -1, prices[day], strikes, expiries, t[day],
+                                             risk_free_rate, volatility[day], option_type, num_contracts[exiting],
+                                             option_prices)
+            asset[entering] = current_asset_value[entering]
+            holding[entering] = True
+
+            # Exiting or updating a position
+            staying = updating & ~exits[day]
+            cash[exiting] = cash[exiting] + current_asset_value[exiting]
+            asset[exiting] = np.nan
+            holding[exiting] = False
+            asset[staying] = current_asset_value[staying]
+
+        asset_values[day] = asset
+        cash_values[day] = cash
+
+    return asset_values, cash_values
+
+
+def path_costs_(cost_model, trading, side, prices, strikes, expiries, t, risk_free_rate, volatility, option_type,
+                num_contracts, option_prices):
+    '''Execution costs of the trading paths, in one vectorized call.'''
+    tau = (expiries[trading] - t).astype(float) / 365
+    return cost_model.costs(prices[trading], strikes[trading], tau, risk_free_rate, volatility[trading],
+                            option_type == "call", num_contracts, side, option_prices[trading])
+
+
+def summarize_portfolio_values(portfolio_values, percentiles=(0.05, 0.25, 0.5, 0.75, 0.95), asset_values=None):
+    '''
+    Summarizes the distribution of outcomes across paths.
+
+    input
+    -----
+        portfolio_values - np.ndarray (days x paths) of portfolio values
+        percentiles - quantiles to report
+        asset_values - optional np.ndarray (days x paths) of asset values to summarize the trades and exposure
+
+    returns
+    -------
+        pd.DataFrame of summary statistics (mean, std, quantiles, ...) of the METRIC_COLUMNS of Metrics
+    '''
+    return performance_metrics(portfolio_values, asset_values).describe(percentiles=list(percentiles))
+
+
+class MonteCarloBacktest:
+    '''
+    Runs the strategy over many simulated price paths in one call.
+
+    attributes
+    ----------
+        market_data - Columnar expanded market data of every path, see expand_market_paths
+        trade_size_logic - Vectorized function to determine the number of contracts to trade
+        option_type - either "put" or "call"
+        pricing_cache - Optional PricingCache in front of the pricing calls
+        cost_model - Optional CostModel charging the execution costs, it can be replaced between runs to sweep
+                     the cost assumptions over the same expanded paths
+        asset_values, cash_values - np.ndarrays (days x paths) filled by run_backtest
+
+    methods
+    -------
+        run_backtest - runs the backtest for every path
+        run_compiled_backtest - runs the backtest for every path with the compiled kernel
+        export_results_as_df - returns a pd.DataFrame of the per-path results
+        export_metrics_as_df - returns a pd.DataFrame of the performance metrics of every path
+        summary_statistics - returns a pd.DataFrame summarizing the distribution of outcomes
+    '''
+
+    def __init__(self, price_paths, trade_size_logic, option_type, expiry_series, ma_lag=200, initial_cash=50000,
+                 min_days_to_expiry=90, n_strikes_away=1, volatility_window=20, pricing_cache=None, cost_model=None,
+                 strike_increment=2.5):
+        self.market_data = expand_market_paths(price_paths, option_type, ma_lag, expiry_series,
+                                               min_days_to_expiry, n_strikes_away, volatility_window, strike_increment)
+        self.trade_size_logic = trade_size_logic
+        self.option_type = option_type
+        self.expiry_series = expiry_series
+        self.initial_cash = initial_cash
+        self.pricing_cache = pricing_cache
+        self.cost_model = cost_model
+
+        self.asset_values = None
+        self.cash_values = None
+
+    def run_backtest(self):
+        self.asset_values, self.cash_values = run_batch_trade_logic(self.market_data, self.option_type,
+                                                                    self.trade_size_logic, self.initial_cash,
+                                                                    pricing_cache=self.pricing_cache,
+                                                                    cost_model=self.cost_model)
+
+    def run_compiled_backtest(self, sizing_rule="percent_cash", sizing_parameter=0.9):
+        '''Runs every path with the compiled kernel, see CompiledKernel.run_trade_kernel.'''
+        if self.cost_model is not None:
+            raise ValueError("The compiled backtest does not support cost_model")
+
+        from CompiledKernel import run_trade_kernel  # Imported here so Numba is only loaded when used
+        self.asset_values, self.cash_values = run_trade_kernel(self.market_data, self.option_type, sizing_rule,
+                                                               sizing_parameter, self.initial_cash)
+
+    def portfolio_values(self):
+        return self.cash_values + np.nan_to_num(self.asset_values)
+
+    def export_results_as_df(self):
+        '''Returns a pd.DataFrame indexed by day with columns (value type, path).'''
+        values = {"UnderlyingValue": self.market_data["Price"], "AssetValue": self.asset_values,
+                  "CashValue": self.cash_values, "PortfolioValue": self.portfolio_values()}
+        index = self.market_data["index"]
+        return pd.concat({name: pd.DataFrame(value, index=index) for name, value in values.items()}, axis=1)
+
+    def export_metrics_as_df(self, risk_free_rate=0.03):
+        '''Returns a pd.DataFrame of the metrics of every path, see Metrics.performance_metrics'''
+        return performance_metrics(self.portfolio_values(), self.asset_values, risk_free_rate)
+
+    def summary_statistics(self, percentiles=(0.05, 0.25, 0.5, 0.75, 0.95)):
+        return summarize_portfolio_values(self.portfolio_values(), percentiles, self.asset_values)
@@ -0,0 +1,134 @@
+'''
+
+ParameterSweep.py
+
+File contents:
+
+    functions
+    ---------
+        parameter_grid
+        summarize_results
+        initialize_worker
+        worker_data
+        worker_market_data
+        build_backtest
+        run_configuration
+        run_parameter_sweep
+
+    constants
+    ---------
+        DEFAULT_PARAMETERS
+
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import product
+import pandas as pd
+from Backtest import Backtest
+from Metrics import journal_metrics
+from PricingCache import default_pricing_cache
+from TransactionCosts import COST_PARAMETERS, cost_model_from_parameters
+from TradeLogic import trade_size_logic
+
+
+DEFAULT_PARAMETERS = {"ma_lag": 200, "option_type": "call", "min_days_to_expiry": 90,
+                      "n_strikes_away": 1, "percent_cash": 0.9, "volatility_window": 20, "strike_increment": 2.5,
+                      "multi_position": False, "record_greeks": False, **COST_PARAMETERS}
+
+# Data shared by every configuration, set once per worker process by initialize_worker
+_shared_data = {}
+
+
+def parameter_grid(**parameter_values):
+    '''
+    Builds the list of configurations of a full grid.
+
+    input
+    -----
+        parameter_values - parameter name to list of values, e.g. ma_lag=[50, 100], option_type=["call", "put"]
+
+    returns
+    -------
+        list of configuration dictionaries, any parameter not given takes its DEFAULT_PARAMETERS value
+    '''
+    names = list(parameter_values)
+    return [dict(DEFAULT_PARAMETERS, **dict(zip(names, values))) for values in product(*parameter_values.values())]
+
+
+def summarize_results(results):
+    '''Summarizes a trade journal from Backtest.export_results_as_df into a dictionary of metrics, see Metrics.'''
+    return journal_metrics(results)
+
+
+def initialize_worker(price_series=None, expiry_series=None, **shared_data):
+    '''
+    Stores the market data, and any other shared_data by name, in the worker process so that it is only sent
+    once per worker. Passed with functools.partial as the initializer of the pool for keyword shared_data.
+    '''
+    _shared_data.update(shared_data, price_series=price_series, expiry_series=expiry_series)
+
+
+def worker_data(name, value=None):
+    '''Returns value, or the name entry of the worker process's shared data when it is None.'''
+    return _shared_data[name] if value is None else value
+
+
+def worker_market_data(price_series=None, expiry_series=None):
+    '''Returns the given series, or the market data of the worker process when none are given.'''
+    return worker_data("price_series", price_series), worker_data("expiry_series", expiry_series)
+
+
+def build_backtest(config, price_series, expiry_series):
+    '''
+    Builds the Backtest of a configuration, any parameter not given taking its DEFAULT_PARAMETERS value.
+    Backtests built in the same process share default_pricing_cache, so a contract priced by one
+    configuration on a day is not priced again by the next.
+    '''
+    config = dict(DEFAULT_PARAMETERS, **config)
+    size_logic = partial(trade_size_logic, percent_cash=config["percent_cash"])
+    return Backtest(price_series, size_logic, config["option_type"], expiry_series, config["ma_lag"],
+                    min_days_to_expiry=config["min_days_to_expiry"], n_strikes_away=config["n_strikes_away"],
+                    volatility_window=config["volatility_window"], record_greeks=config["record_greeks"],
+                    multi_position=config["multi_position"], pricing_cache=default_pricing_cache,
+                    strike_increment=config["strike_increment"], cost_model=cost_model_from_parameters(config))
+
+
+def run_configuration(config, price_series=None, expiry_series=None):
+    '''
+    Runs a single configuration of the sweep, using the worker's shared data when no series are given.
+
+    returns
+    -------
+        dictionary of the configuration and its metrics, see summarize_results
+    '''
+    config = dict(DEFAULT_PARAMETERS, **config)
+    bt = build_backtest(config, *worker_market_data(price_series, expiry_series))
+    bt.run_backtest()
+    return dict(config, **summarize_results(bt.export_results_as_df()))
+
+
+def run_parameter_sweep(price_series, expiry_series, configurations, max_workers=None, chunksize=1):
+    '''
+    Runs a Backtest for every configuration across a process pool.
+
+    input
+    -----
+        price_series - pd.Series of asset prices shared by every configuration
+        expiry_series - pd.Series of expiration dates shared by every configuration
+        configurations - list of configuration dictionaries, see parameter_grid
+        max_workers - number of worker processes, 1 runs the sweep in the current process
+        chunksize - number of configurations sent to a worker at a time
+
+    returns
+    -------
+        pd.DataFrame with one row per configuration, holding its parameters and metrics
+    '''
+    if max_workers == 1:
+        rows = [run_configuration(config, price_series, expiry_series) for config in configurations]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=initialize_worker,
+                                 initargs=(price_series, expiry_series)) as executor:
+            rows = list(executor.map(run_configuration, configurations, chunksize=chunksize))
+
+    return pd.DataFrame(rows)
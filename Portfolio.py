@@ -0,0 +1,145 @@
+'''
+
+Portfolio.py
+
+File contents:
+
+    classes
+    -------
+        Portfolio
+
+    constants
+    ---------
+        POSITION_FIELDS
+
+'''
+
+import numpy as np
+from Account import Account
+from BlackScholesOptionPricing import option_greeks, option_prices
+from Calendar import to_days
+
+
+# Struct-of-arrays layout of the positions, one array per field
+POSITION_FIELDS = {"underlying": np.int64, "is_call": np.bool_, "strike": np.float64, "expiry": "datetime64[D]",
+                   "rate": np.float64, "num_contracts": np.float64, "value": np.float64}
+
+
+class Portfolio:
+    '''
+    Holds many concurrent option positions across strikes, expirations and underlying assets.
+
+    initial inputs
+    --------------
+    account_data - Account object whose cash pays for the positions (a new Account when not given)
+    underlyings - Names of the underlying assets, positions refer to an underlying by its index in this list
+    capacity - Number of positions allocated up front, grown as needed
+    instrumentation - Optional Instrumentation object timing the pricing calls under "option_pricing"
+
+    attributes
+    ----------
+    positions - Dictionary of np.ndarrays, one per POSITION_FIELDS entry, of which the first size are held
+    size - The number of positions held
+    pricing_function - The vectorized option_prices function the positions are priced with
+
+    methods
+    -------
+    open_position - * Buys a new position with the account's cash
+                    * Inputs:
+                        underlying, option_type, strike, expiry, num_contracts, option_price, rate
+                        cost - execution costs paid on top of the option price (see CostModel)
+
+    mark_to_market - * Prices every position in one vectorized call and updates the account's asset value
+                     * Inputs:
+                         spot_prices, volatilities, t - spot prices and volatilities indexed by underlying
+
+    greeks - * Returns the dictionary of the Greeks of the positions summed over the portfolio, scaled by the
+               contracts held (0 when no position is held)
+             * Inputs:
+                 spot_prices, volatilities, t - spot prices and volatilities indexed by underlying
+
+    close_positions - * Sells the selected positions at their last marked value
+                      * Inputs:
+                          mask - boolean np.ndarray over the held positions (all positions when not given)
+                          cost - execution costs taken from the sale (see CostModel)
+    '''
+
+    def __init__(self, account_data=None, underlyings=("",), capacity=16, instrumentation=None):
+        self.account_data = Account() if account_data is None else account_data
+        self.underlyings = list(underlyings)
+        self.positions = {name: np.zeros(capacity, dtype=dtype) for name, dtype in POSITION_FIELDS.items()}
+        self.size = 0
+        self.pricing_function = option_prices
+        if instrumentation is not None:
+            self.pricing_function = instrumentation.wrap("option_pricing", self.pricing_function)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, name):
+        '''Returns the view of a field over the held positions.'''
+        return self.positions[name][:self.size]
+
+    def grow_(self):
+        for name, array in self.positions.items():
+            self.positions[name] = np.concatenate([array, np.zeros_like(array)])
+
+    def update_account_(self):
+        self.account_data.asset_value = float(self["value"].sum()) if self.size > 0 else None
+
+    def open_position(self, underlying, option_type, strike, expiry, num_contracts, option_price, rate=0.03,
+                      cost=0.0):
+        '''Opens a position and returns its index, the cost is paid from the account's cash.'''
+        if self.size == len(self.positions["value"]):
+            self.grow_()
+
+        i = self.size
+        new_position = {"underlying": underlying, "is_call": option_type == "call", "strike": strike,
+                        "expiry": to_days(expiry), "rate": rate, "num_contracts": num_contracts,
+                        "value": option_price * num_contracts}
+        for name, value in new_position.items():
+            self.positions[name][i] = value
+        self.size += 1
+
+        self.account_data.cash_value = self.account_data.cash_value - new_position["value"] - cost
+        self.update_account_()
+        return i
+
+    def mark_to_market(self, spot_prices, volatilities, t):
+        '''Returns the np.ndarray of the option price of every position.'''
+        underlying = self["underlying"]
+        spot_prices = np.atleast_1d(spot_prices)[underlying]
+        volatilities = np.atleast_1d(volatilities)[underlying]
+        tau = (self["expiry"] - to_days(t)).astype(np.float64) / 365
+
+        prices = self.pricing_function(spot_prices, self["strike"], tau, self["rate"], volatilities, self["is_call"])
+        self["value"][:] = prices * self["num_contracts"]
+        self.update_account_()
+        return prices
+
+    def greeks(self, spot_prices, volatilities, t):
+        underlying = self["underlying"]
+        spot_prices = np.atleast_1d(spot_prices)[underlying]
+        volatilities = np.atleast_1d(volatilities)[underlying]
+        tau = (self["expiry"] - to_days(t)).astype(np.float64) / 365
+
+        totals = {name: 0.0 for name in ["delta", "gamma", "vega", "theta", "rho"]}
+        for option_type, held in [("call", self["is_call"]), ("put", ~self["is_call"])]:
+            if held.any():
+                greeks = option_greeks(spot_prices[held], self["strike"][held], tau[held], self["rate"][held],
+                                       volatilities[held], option_type)
+                for name in totals:
+                    totals[name] += float((greeks[name] * self["num_contracts"][held]).sum())
+        return totals
+
+    def close_positions(self, mask=None, cost=0.0):
+        '''Sells the selected positions at their last marked value and removes them from the portfolio.'''
+        mask = np.ones(self.size, dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+        self.account_data.cash_value = self.account_data.cash_value + float(self["value"][mask].sum()) - cost
+
+        keep = ~mask
+        n_kept = int(keep.sum())
+        for name in self.positions:
+            self.positions[name][:n_kept] = self[name][keep]
+        self.size = n_kept
+        self.update_account_()
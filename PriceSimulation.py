@@ -7,70 +7,76 @@ File contents
     functions
     ---------
         ou_process_function
+        ou_paths_function
         simulate_expiry_date
         simulate_dates
         create_ou_process
+        create_ou_paths
 
 '''
 
-from numpy import random
-from pandas import Series
-import datetime as dt
+from numpy import random, empty, full, flatnonzero
+from pandas import Series, DataFrame
+from Calendar import business_days, is_third_friday
 
 
-def ou_process_function(S0, alpha, beta, sigma, sample_length):
-    def ou(S, alpha, beta, sigma, dw):
-        return -beta * (S - alpha) + sigma * dw
+def ou_process_function(S0, alpha, beta, sigma, sample_length, random_state=None):
+    '''Simulates a single OU process, see ou_paths_function'''
+    return ou_paths_function(S0, alpha, beta, sigma, sample_length, 1, random_state)[0]
 
-    dW = random.randn(sample_length - 1)
-    prices = [S0]
-    for i in range(sample_length - 1):
-        S = prices[-1]
-        prices.append(S + ou(S, alpha, beta, sigma, dW[i]))
 
+def ou_paths_function(S0, alpha, beta, sigma, sample_length, n_paths, random_state=None):
+    '''
+    Simulates n_paths OU processes at once. Returns a np.ndarray (n_paths x sample_length).
 
-    return prices
-
-
-def simulate_expiry_dates(data):
-    '''Simulates Expiration dates to be every 3rd Friday'''
+    Each step S + -beta * (S - alpha) + sigma * dW is the linear recursion S_next = (1 - beta) * S + x with
+    x = beta * alpha + sigma * dW, so the whole path is computed by a single lfilter call over the noise.
 
-    def is_third_friday(d):
-        # https://stackoverflow.com/questions/18424467/python-third-friday-of-a-month
-        return d.weekday() == 4 and 15 <= d.day <= 21
+    random_state - None, an int seed or a np.random.Generator used to draw the noise
+    '''
+    rng = random.default_rng(random_state)
+    x = rng.standard_normal((n_paths, sample_length - 1))
+    x *= sigma
+    x += beta * alpha
 
-    return Series([day if is_third_friday(day) else None for day in data.index]).dropna()
+    prices = empty((n_paths, sample_length))
+    prices[:, 0] = S0
+    initial_state = full((n_paths, 1), (1 - beta) * S0)
+    from scipy.signal import lfilter  # Imported here since scipy.signal is slow to import
+    prices[:, 1:] = lfilter([1], [1, beta - 1], x, axis=1, zi=initial_state)[0]
 
+    return prices
 
-def simulate_dates(data):
-    def is_weekday(date):
-        if date.weekday() == 5:
-            return False
-        elif date.weekday() == 6:
-            return False
-        return True
-
-    num_trading_days = len(data)
-
-    end_date = dt.date.today()
 
-    dates = []
+def simulate_expiry_dates(data):
+    '''Simulates Expiration dates to be every 3rd Friday, indexed by their position in data'''
+    third_fridays = is_third_friday(data.index)
+    return Series(list(data.index[third_fridays]), index=flatnonzero(third_fridays))
 
-    current_date = end_date
-    while len(dates) < num_trading_days:
-        if is_weekday(current_date):
-            dates.append(current_date)
-        current_date = current_date - dt.timedelta(days=1)
 
-    return dates[::-1]
+def simulate_dates(data):
+    '''Returns the weekdays up to today, one for every value of data, as date objects'''
+    return business_days(len(data)).tolist()
 
 
-def create_ou_process(S0=30, alpha=50, beta=0.01, sigma=0.5, sample_length=100, with_expiry=True):
+def create_ou_process(S0=30, alpha=50, beta=0.01, sigma=0.5, sample_length=100, with_expiry=True, random_state=None):
 
-    p = ou_process_function(S0, alpha, beta, sigma, sample_length)
+    p = ou_process_function(S0, alpha, beta, sigma, sample_length, random_state)
     t = simulate_dates(p)
     S = Series(p, index=t)
     if with_expiry:
         return S, simulate_expiry_dates(S)
     else:
         return S
+
+
+def create_ou_paths(n_paths=1000, S0=30, alpha=50, beta=0.01, sigma=0.5, sample_length=100, with_expiry=True,
+                    random_state=None):
+    '''Simulates a pd.DataFrame of OU price paths with one row per path and one column per date'''
+    p = ou_paths_function(S0, alpha, beta, sigma, sample_length, n_paths, random_state)
+    t = simulate_dates(p[0])
+    S = DataFrame(p, columns=t)
+    if with_expiry:
+        return S, simulate_expiry_dates(S.iloc[0])
+    else:
+        return S
@@ -0,0 +1,124 @@
+'''
+
+PricingCache.py
+
+File contents:
+
+    classes
+    -------
+        PricingCache
+
+'''
+
+from collections import OrderedDict
+from hashlib import sha1
+import threading
+import numpy as np
+
+
+class PricingCache:
+    '''
+    Bounded cache of option prices keyed by quantized pricing inputs, so that repeated evaluations of the same
+    contract on the same day (e.g. across the configurations of a sweep or the reruns of a Monte Carlo) are
+    only priced once.
+
+    The inputs are rounded to the given number of decimals and the price is computed from the rounded
+    inputs, so a result never depends on which of two nearly equal evaluations came first. Scalar inputs are
+    keyed on their values, array inputs on a hash of their bytes. Like FeatureCache, it can be shared between
+    threads, the lookups being locked and the pricing done outside the lock.
+
+    initial inputs
+    --------------
+    maxsize - The maximum number of prices held before one is evicted
+    decimals - The number of decimals the inputs are rounded to, None to key on the exact inputs
+    eviction - Either "lru" (least recently used) or "fifo" (first in, first out)
+
+    attributes
+    ----------
+    hits - The number of evaluations that were served from the cache
+    misses - The number of evaluations that had to be priced
+
+    methods
+    -------
+    price - * Returns the cached price of the inputs, pricing and storing them on a miss
+            * Inputs:
+                pricing_function - e.g. call_option_prices
+                spot_price, strike, time_to_expiration, risk_free_rate, volatility
+
+    wrap - * Returns pricing_function with the cache in front of it
+           * Inputs:
+               pricing_function
+
+    clear - * Removes every price and resets the statistics
+
+    hit_rate - * The fraction of evaluations served from the cache
+    '''
+
+    def __init__(self, maxsize=65536, decimals=10, eviction="lru"):
+        if eviction not in ("lru", "fifo"):
+            raise ValueError("eviction must be either 'lru' or 'fifo', got %r" % (eviction,))
+        self.maxsize = maxsize
+        self.decimals = decimals
+        self.eviction = eviction
+        self.hits = 0
+        self.misses = 0
+        self._prices = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._prices)
+
+    def quantize_(self, value):
+        value = np.asarray(value, dtype=np.float64)
+        return value if self.decimals is None else np.round(value, self.decimals)
+
+    def key_(self, pricing_function, inputs):
+        if all(value.ndim == 0 for value in inputs):
+            return (pricing_function.__name__,) + tuple(float(value) for value in inputs)
+        digest = sha1()
+        for value in inputs:
+            digest.update(repr(value.shape).encode())
+            digest.update(np.ascontiguousarray(value).tobytes())
+        return (pricing_function.__name__, digest.hexdigest())
+
+    def price(self, pricing_function, spot_price, strike, time_to_expiration, risk_free_rate, volatility):
+        '''Cached array prices are shared between callers and must not be modified in place.'''
+        inputs = [self.quantize_(value) for value in
+                  (spot_price, strike, time_to_expiration, risk_free_rate, volatility)]
+        key = self.key_(pricing_function, inputs)
+
+        with self._lock:
+            if key in self._prices:
+                self.hits += 1
+                if self.eviction == "lru":
+                    self._prices.move_to_end(key)
+                return self._prices[key]
+            self.misses += 1
+
+        price = pricing_function(*inputs)
+        with self._lock:
+            self._prices[key] = price
+            if len(self._prices) > self.maxsize:
+                self._prices.popitem(last=False)
+        return price
+
+    def wrap(self, pricing_function):
+        def cached_pricing_function(spot_price, strike, time_to_expiration, risk_free_rate, volatility):
+            return self.price(pricing_function, spot_price, strike, time_to_expiration, risk_free_rate, volatility)
+        cached_pricing_function.__name__ = pricing_function.__name__
+        cached_pricing_function.__doc__ = pricing_function.__doc__
+        return cached_pricing_function
+
+    def hit_rate(self):
+        evaluations = self.hits + self.misses
+        return self.hits / evaluations if evaluations > 0 else np.nan
+
+    def clear(self):
+        with self._lock:
+            self._prices.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Cache shared by the configurations of a sweep run in the same process unless another one is given
+default_pricing_cache = PricingCache()
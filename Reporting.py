@@ -0,0 +1,43 @@
+'''
+
+Reporting.py
+
+Plotting of backtest results. matplotlib is an optional dependency that is only imported when a plot is made.
+
+File contents:
+
+    functions
+    ---------
+        plot_results
+
+'''
+
+
+def plot_results(results, ma_lag, path="test_results.png"):
+    '''
+    Plots the option portfolio value and the underlying asset value of a backtest.
+
+    input
+    -----
+        results - pd.DataFrame from Backtest.export_results_as_df
+        ma_lag - the moving average lag of the backtest, plotted over the underlying asset value
+        path - file the figure is saved to, None to leave the figure open instead
+
+    returns
+    -------
+        the matplotlib figure
+    '''
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(2, figsize=(12,7))
+    ax[0].set_title("Option Porfolio Value")
+    ax[1].set_title("Underlying Asset Value")
+    results.drop(["UnderlyingValue"], axis=1).plot(ax=ax[0])
+    results.AssetValue.rolling(15).mean().plot(ax=ax[0])
+    results.UnderlyingValue.plot(ax=ax[1])
+    results.UnderlyingValue.rolling(ma_lag).mean().plot(ax=ax[1])
+
+    if path is not None:
+        fig.savefig(path)
+        plt.close(fig)
+    return fig
@@ -0,0 +1,278 @@
+'''
+
+RunBacktests.py
+
+Runs a batch of backtests described by a run spec file (YAML, JSON or TOML), in parallel, writing the trade
+journal of every run in a columnar format along with a summary of the batch.
+
+    python RunBacktests.py spec.yaml --output results --workers 8 --headless
+
+A run spec looks like (as YAML):
+
+    data:                     # source is one of ou, csv, parquet, npy
+      source: ou
+      sample_length: 2000
+      random_state: 0
+    output:
+      directory: results
+      format: npz             # npz, parquet or csv
+      plot: false
+    defaults:                 # applied to every run, see RUN_PARAMETERS
+      ma_lag: 100
+    runs:                     # explicit runs ...
+      - name: put_50
+        option_type: put
+        ma_lag: 50
+    grid:                     # ... and/or a grid of runs, see parameter_grid
+      ma_lag: [50, 100, 200]
+      option_type: [call, put]
+
+File contents:
+
+    functions
+    ---------
+        load_run_spec
+        load_market_data
+        build_runs
+        write_journal
+        run_single_backtest
+        run_batch
+        main
+
+    constants
+    ---------
+        RUN_PARAMETERS
+        JOURNAL_FORMATS
+
+'''
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import product
+import numpy as np
+import pandas as pd
+from ParameterSweep import (DEFAULT_PARAMETERS, build_backtest, initialize_worker, summarize_results,
+                            worker_market_data)
+from PriceSimulation import create_ou_process, simulate_expiry_dates
+
+
+# Runs take the parameters of a sweep configuration
+RUN_PARAMETERS = DEFAULT_PARAMETERS
+JOURNAL_FORMATS = ["npz", "parquet", "csv"]
+
+
+def load_run_spec(path):
+    '''Reads a run spec from a .yaml/.yml (requires PyYAML), .json or .toml file into a dictionary.'''
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".yaml", ".yml"):
+        import yaml
+        with open(path) as f:
+            return yaml.safe_load(f)
+    elif extension == ".json":
+        with open(path) as f:
+            return json.load(f)
+    elif extension == ".toml":
+        import tomllib
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    raise ValueError("Unsupported run spec format %r, expected .yaml, .yml, .json or .toml" % extension)
+
+
+def load_market_data(data_spec):
+    '''
+    Loads the price series and expiration dates of a run spec's data section.
+
+    input
+    -----
+        data_spec - dictionary with a source of:
+                        ou - simulated, with the create_ou_process parameters (S0, alpha, beta, sigma,
+                             sample_length, random_state)
+                        csv, parquet - a path, with price_column (default Price) and date_column (default the
+                                       first column for csv, the index for parquet)
+                        npy - prices_path and dates_path
+                    File sources take their expiration dates from an optional expiry_path (a csv of dates)
+                    and otherwise use the third Fridays of their dates.
+
+    returns
+    -------
+        price_series, expiry_series
+    '''
+    data_spec = dict(data_spec)
+    source = data_spec.pop("source", "ou")
+    if source == "ou":
+        return create_ou_process(**data_spec)
+
+    price_column = data_spec.get("price_column", "Price")
+    date_column = data_spec.get("date_column")
+    if source == "csv":
+        data = pd.read_csv(data_spec["path"], index_col=0 if date_column is None else date_column, parse_dates=True)
+        price_series = data[price_column]
+    elif source == "parquet":
+        data = pd.read_parquet(data_spec["path"])
+        price_series = (data if date_column is None else data.set_index(date_column))[price_column]
+    elif source == "npy":
+        price_series = pd.Series(np.load(data_spec["prices_path"]),
+                                 index=pd.DatetimeIndex(np.load(data_spec["dates_path"])))
+    else:
+        raise ValueError("Unknown data source %r, expected ou, csv, parquet or npy" % source)
+
+    price_series = price_series.astype(np.float64).sort_index()
+    if "expiry_path" in data_spec:
+        expiry_series = pd.Series(pd.to_datetime(pd.read_csv(data_spec["expiry_path"]).iloc[:, 0]))
+    else:
+        expiry_series = simulate_expiry_dates(price_series)
+    return price_series, expiry_series
+
+
+def build_runs(spec):
+    '''
+    Builds the list of runs of a run spec, its explicit runs followed by its grid.
+
+    returns
+    -------
+        list of run dictionaries holding a name and every RUN_PARAMETERS value
+    '''
+    defaults = dict(RUN_PARAMETERS, **spec.get("defaults", {}))
+    configurations = [dict(run) for run in spec.get("runs", [])]
+
+    grid = spec.get("grid", {})
+    if grid:
+        names = list(grid)
+        configurations += [dict(zip(names, values)) for values in product(*grid.values())]
+
+    if not configurations:
+        configurations = [{}]
+
+    runs = []
+    for i, configuration in enumerate(configurations):
+        name = configuration.pop("name", None)
+        run = dict(defaults, **configuration)
+        unknown = set(run) - set(RUN_PARAMETERS)
+        if unknown:
+            raise ValueError("Unknown run parameters %s, expected any of %s" % (sorted(unknown), list(RUN_PARAMETERS)))
+        if name is None:
+            name = "run%03d_%s_%s" % (i, run["option_type"], run["ma_lag"])
+        runs.append(dict(run, name=str(name)))
+    return runs
+
+
+def write_journal(journal, path, journal_format="npz"):
+    '''
+    Writes a trade journal column by column.
+
+    input
+    -----
+        journal - pd.DataFrame from Backtest.export_results_as_df
+        path - file path without its extension
+        journal_format - npz (one array per column plus the index), parquet (requires pyarrow or fastparquet)
+                         or csv
+
+    returns
+    -------
+        the path written to
+    '''
+    if journal_format == "npz":
+        path += ".npz"
+        np.savez(path, index=np.asarray(journal.index, dtype="datetime64[ns]"),
+                 **{column: journal[column].to_numpy() for column in journal.columns})
+    elif journal_format == "parquet":
+        path += ".parquet"
+        journal.to_parquet(path)
+    elif journal_format == "csv":
+        path += ".csv"
+        journal.to_csv(path)
+    else:
+        raise ValueError("Unknown journal format %r, expected one of %s" % (journal_format, JOURNAL_FORMATS))
+    return path
+
+
+def run_single_backtest(run, output_directory, journal_format="npz", plot=False, price_series=None,
+                        expiry_series=None):
+    '''
+    Runs one run of the batch, writing its journal (and plot) to output_directory. The worker's shared market
+    data is used when no series are given.
+
+    returns
+    -------
+        dictionary of the run, the journal path and its metrics, see summarize_results
+    '''
+    bt = build_backtest(run, *worker_market_data(price_series, expiry_series))
+    bt.run_backtest()
+    journal = bt.export_results_as_df()
+
+    path = write_journal(journal, os.path.join(output_directory, run["name"]), journal_format)
+    if plot:
+        from Reporting import plot_results
+        plot_results(journal, run["ma_lag"], os.path.join(output_directory, run["name"] + ".png"))
+
+    return dict(run, Journal=path, **summarize_results(journal))
+
+
+def run_batch(spec, output_directory=None, journal_format=None, plot=None, max_workers=None):
+    '''
+    Runs every run of a run spec across a process pool. Arguments given here take precedence over the
+    spec's output section.
+
+    input
+    -----
+        spec - run spec dictionary, see load_run_spec
+        output_directory - directory the journals, plots and summary.csv are written to
+        journal_format - one of JOURNAL_FORMATS
+        plot - whether to plot every run (requires matplotlib)
+        max_workers - number of worker processes, 1 runs the batch in the current process
+
+    returns
+    -------
+        pd.DataFrame with one row per run, holding its parameters, journal path and metrics
+    '''
+    output = spec.get("output", {})
+    output_directory = output.get("directory", "results") if output_directory is None else output_directory
+    journal_format = output.get("format", "npz") if journal_format is None else journal_format
+    plot = output.get("plot", False) if plot is None else plot
+    if journal_format not in JOURNAL_FORMATS:
+        raise ValueError("Unknown journal format %r, expected one of %s" % (journal_format, JOURNAL_FORMATS))
+
+    runs = build_runs(spec)
+    names = [run["name"] for run in runs]
+    if len(set(names)) != len(names):
+        raise ValueError("Run names must be unique, as they name the journal files")
+
+    price_series, expiry_series = load_market_data(spec.get("data", {}))
+    os.makedirs(output_directory, exist_ok=True)
+
+    run_function = partial(run_single_backtest, output_directory=output_directory, journal_format=journal_format,
+                           plot=plot)
+    if max_workers == 1:
+        rows = [run_function(run, price_series=price_series, expiry_series=expiry_series) for run in runs]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=initialize_worker,
+                                 initargs=(price_series, expiry_series)) as executor:
+            rows = list(executor.map(run_function, runs))
+
+    summary = pd.DataFrame(rows)
+    summary.to_csv(os.path.join(output_directory, "summary.csv"), index=False)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the backtests of a run spec file.")
+    parser.add_argument("spec", help="run spec file (.yaml, .yml, .json or .toml)")
+    parser.add_argument("--output", default=None, help="output directory, overrides the spec")
+    parser.add_argument("--format", default=None, choices=JOURNAL_FORMATS, help="journal format, overrides the spec")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes, 1 runs serially")
+    plotting = parser.add_mutually_exclusive_group()
+    plotting.add_argument("--plot", action="store_true", default=None, help="plot every run")
+    plotting.add_argument("--headless", action="store_true", help="never plot or import matplotlib")
+    args = parser.parse_args(argv)
+
+    plot = False if args.headless else args.plot
+    summary = run_batch(load_run_spec(args.spec), args.output, args.format, plot, args.workers)
+    print(summary.to_string(index=False))
+    return summary
+
+
+if __name__ == "__main__":
+    main()
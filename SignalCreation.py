@@ -6,20 +6,23 @@ File Contents:
 
     functions
     ---------
-        call_buy_signal
-        put_buy_signals
+        call_signals
+        put_signals
+        custom_signals
         expand_market_data
+        expand_market_arrays
 
 '''
 import pandas as pd
-from UtilityFunctions import bull_cross, bear_cross, get_month_number
-from UtilityFunctions import  get_nearest_expiry, get_strike_n_below_price
+from UtilityFunctions import bull_crosses, bear_crosses, get_month_number
+from UtilityFunctions import get_nearest_expiries, get_strike_n_below_price
+import numpy as np
 from numpy import sqrt
 
 
 # HELPER FUNCTIONS
 # ================
-def apply_signal(data, option_type):
+def apply_signal(data, option_type, signal_functions=None):
     '''
     Applies the signal function of a specified option to the data
 
@@ -27,27 +30,33 @@ def apply_signal(data, option_type):
     ------
         data - Market data as a pd.DataFrame with columns: [Price, MovingAverage]
         option_type - Either "call" or "put"
+        signal_functions - Optional (buy_signal_function, sell_signal_function) pair replacing the default
+                           crosses, see create_entry_and_exit_signal
 
     return
     ------
         pd.DataFrame with columns: [Entry, Exit, In-trade]
     '''
+    if signal_functions is not None:
+        direction = -1 if option_type == "put" else 1
+        return custom_signals(data, *signal_functions, direction=direction)
     return {"call": call_signals, "put": put_signals}[option_type](data)
 
 
 def create_entry_and_exit_signal(df, buy_signal_function, sell_signal_function):
-    # This could be where some creative programming could exist to make the back test
-    # be capable of doing advanced entry and exits. Could perhaps use a list of buy columns
-    # and a list of sell columns that get used as input into the buy_signal_function
-    # and sell_signal_function
-    prev_df = df.shift()
+    '''
+    Creates the Entry and Exit signals for the whole DataFrame at once.
 
-    new_vals = {}
-    for ind, row in df.iterrows():
-        vec = [row.Price, prev_df.loc[ind].Price, row.MovingAverage, prev_df.loc[ind].MovingAverage]
-        new_vals[ind] = [buy_signal_function(*vec), sell_signal_function(*vec)]
+    The signal functions are vectorized callables with the signature f(p1, p0, m1, m0) taking np.ndarrays
+    of the current price, previous price, current moving average and previous moving average, and returning
+    a boolean np.ndarray (see bull_crosses and bear_crosses).
+    '''
+    price = df.Price.to_numpy()
+    moving_average = df.MovingAverage.to_numpy()
+    vec = [price, df.Price.shift().to_numpy(), moving_average, df.MovingAverage.shift().to_numpy()]
 
-    return pd.DataFrame(new_vals, index=["Entry", "Exit"]).T
+    return pd.DataFrame({"Entry": np.asarray(buy_signal_function(*vec), dtype=bool),
+                         "Exit": np.asarray(sell_signal_function(*vec), dtype=bool)}, index=df.index)
 
 
 def determine_in_trade_state(df, temp_df, direction=1):
@@ -62,20 +71,20 @@ def determine_in_trade_state(df, temp_df, direction=1):
     return temp_df
 
 
-def calculate_optimal_strike(prices, option_type, n_strikes_away=1):
-    '''Calculates the optimal strike assuming that strikes are all incremented $2.5 apart.'''
+def calculate_optimal_strike(prices, option_type, n_strikes_away=1, strike_increment=2.5):
+    '''Calculates the optimal strike assuming that strikes are all incremented strike_increment apart.'''
     strikes_below_price = n_strikes_away if option_type == "put" else -n_strikes_away
-    return prices.apply(get_strike_n_below_price, n=strikes_below_price)
+    return pd.Series(get_strike_n_below_price(prices.to_numpy(), strikes_below_price, strike_increment),
+                     index=prices.index)
 
 
 def calculate_optimal_expiration_date(time, exp_series, min_days_to_expiry=90):
     '''Determines the expiration date after the min_days_to_expiry value'''
-    # return time.apply(get_nearest_expiry, min_days_to_expiry, exp_series)
-    temp = []
-    for ind, val in time.iteritems():
-        temp.append(get_nearest_expiry(val, min_days_to_expiry, exp_series))
+    return get_nearest_expiries(time, min_days_to_expiry, exp_series)
 
-    return pd.Series(temp, index=time.index)
+
+def rolling_mean_(prices, moving_average_lag):
+    return prices.rolling(moving_average_lag).mean()
 
 
 def calculate_historical_volatility(prices, volatility_window=10):
@@ -96,17 +105,30 @@ def pad_data(df, moving_average_lag, volatility_window, min_days_to_expiry):
 # ================
 def call_signals(df):
     '''Wrapper function to retrieve buy and sell signals for the call option'''
-    temp_df = create_entry_and_exit_signal(df, bull_cross, bear_cross)
-    return determine_in_trade_state(df, temp_df, 1)
+    return custom_signals(df, bull_crosses, bear_crosses, 1)
 
 
 def put_signals(df):
     '''Wrapper function to retrieve buy and sell signals for the put option'''
-    temp_df = create_entry_and_exit_signal(df, bear_cross, bull_cross)
-    return determine_in_trade_state(df, temp_df, -1)
+    return custom_signals(df, bear_crosses, bull_crosses, -1)
+
 
+def custom_signals(df, buy_signal_function, sell_signal_function, direction=1):
+    '''Retrieves buy and sell signals from user supplied vectorized signal functions'''
+    temp_df = create_entry_and_exit_signal(df, buy_signal_function, sell_signal_function)
+    return determine_in_trade_state(df, temp_df, direction)
 
-def expand_market_data(price_series, option_type, moving_average_lag, exp_series):
+
+def compute_feature(feature_cache, key, compute_function, *args):
+    '''Computes a feature, going through the feature_cache when one is given (see FeatureCache)'''
+    if feature_cache is None:
+        return compute_function(*args)
+    return feature_cache.get(key, compute_function, *args)
+
+
+def expand_market_data(price_series, option_type, moving_average_lag, exp_series, signal_functions=None,
+                       min_days_to_expiry=90, n_strikes_away=1, volatility_window=20, feature_cache=None,
+                       strike_increment=2.5):
     '''
     Expands an asset's price time series into its full data frame with signals and
     optimal option details.
@@ -116,6 +138,14 @@ def expand_market_data(price_series, option_type, moving_average_lag, exp_series
         price_series - pd.Series of asset prices
         moving_average_lag - parameter for the moving average lag
         option_type - either "put" or "call"
+        exp_series - pd.Series of option expiration dates
+        signal_functions - optional (buy_signal_function, sell_signal_function) pair of vectorized signals
+        min_days_to_expiry - minimum number of days to expiration of the optimal option
+        n_strikes_away - number of strikes out of the money of the optimal option
+        volatility_window - window of the historical volatility
+        feature_cache - optional FeatureCache or FeatureStore, features are keyed on a fingerprint of the
+                        price series plus the parameters each feature depends on
+        strike_increment - spacing of the listed strikes
 
     returns
     -------
@@ -131,26 +161,99 @@ def expand_market_data(price_series, option_type, moving_average_lag, exp_series
             * Exit
             * In_trade
     '''
+    cache = feature_cache
+    price_key = cache.fingerprint(price_series) if cache is not None else None
+    strikes_below_price = n_strikes_away if option_type == "put" else -n_strikes_away
+
     market_data = price_series.to_frame()
     market_data.columns = ["Price"]
-    market_data["MovingAverage"] = market_data.Price.rolling(moving_average_lag).mean()
+    market_data["MovingAverage"] = compute_feature(cache, (price_key, "MovingAverage", moving_average_lag),
+                                                   rolling_mean_, market_data.Price, moving_average_lag)
     market_data["t"] = market_data.index.to_series()
 
-    market_data["Month"] = get_month_number(market_data)
+    market_data["Month"] = compute_feature(cache, (price_key, "Month"), get_month_number, market_data)
 
-    min_days_to_expiry = 90
-    market_data["Opt_T"] = calculate_optimal_expiration_date(market_data.t, exp_series, min_days_to_expiry)
+    expiry_key = cache.fingerprint(exp_series) if cache is not None else None
+    market_data["Opt_T"] = compute_feature(cache, (price_key, "Opt_T", expiry_key, min_days_to_expiry),
+                                           calculate_optimal_expiration_date, market_data.t, exp_series,
+                                           min_days_to_expiry)
 
-    n_strikes_away = 1
-    market_data["Opt_K"] = calculate_optimal_strike(market_data.Price, option_type, n_strikes_away)
+    market_data["Opt_K"] = compute_feature(cache, (price_key, "Opt_K", strikes_below_price, strike_increment),
+                                           calculate_optimal_strike, market_data.Price, option_type, n_strikes_away,
+                                           strike_increment)
 
-    volatility_window = 20
-    market_data["Volatility"] = calculate_historical_volatility(market_data.Price, volatility_window)
+    market_data["Volatility"] = compute_feature(cache, (price_key, "Volatility", volatility_window),
+                                                calculate_historical_volatility, market_data.Price, volatility_window)
 
-    option_signal = apply_signal(market_data, option_type)
+    if signal_functions is None:
+        option_signal = compute_feature(cache, (price_key, "Signals", option_type, moving_average_lag),
+                                        apply_signal, market_data, option_type)
+    else:
+        option_signal = apply_signal(market_data, option_type, signal_functions)
     market_data = pd.concat([market_data, option_signal], axis=1)
 
     # Remove the NaN data from the Data Frame
     market_data = pad_data(market_data, moving_average_lag, volatility_window, min_days_to_expiry)
 
     return market_data
+
+
+def expand_market_arrays(prices, dates, option_type, moving_average_lag, exp_series, min_days_to_expiry=90,
+                         n_strikes_away=1, volatility_window=20, dtype=np.float64, strike_increment=2.5):
+    '''
+    Expands many price series sharing the same dates at once, with the same features, signals and padding as
+    expand_market_data, into compact columnar arrays.
+
+    input
+    -----
+        prices - np.ndarray of asset prices (days x series)
+        dates - dates of the rows of prices
+        option_type - either "put" or "call"
+        moving_average_lag - parameter for the moving average lag
+        exp_series - pd.Series of option expiration dates
+        dtype - float dtype used to store Price, Volatility and Opt_K
+        strike_increment - spacing of the listed strikes
+
+    returns
+    -------
+        market_data - dictionary with the following entries:
+            * index - the dates kept after padding
+            * t - current time as datetime64[D] (days)
+            * Opt_T - optimal expiration date as datetime64[D] (days)
+            * Price, Volatility, Opt_K - dtype np.ndarrays (days x series)
+            * Entry, Exit, In_trade - bool np.ndarrays (days x series)
+    '''
+    dates = pd.Index(dates)
+    price_df = pd.DataFrame(np.asarray(prices, dtype=np.float64), index=dates)
+    prices = price_df.to_numpy()
+    moving_average = rolling_mean_(price_df, moving_average_lag).to_numpy()
+    volatility = calculate_historical_volatility(price_df, volatility_window).to_numpy()
+
+    t = dates.to_series()
+    opt_t = calculate_optimal_expiration_date(t, exp_series, min_days_to_expiry)
+
+    strikes_below_price = n_strikes_away if option_type == "put" else -n_strikes_away
+    opt_k = get_strike_n_below_price(prices, strikes_below_price, strike_increment)
+
+    # Signals, see call_signals and put_signals
+    def shift(x):
+        return np.vstack([np.full((1, x.shape[1]), np.nan), x[:-1]])
+
+    vec = [prices, shift(prices), moving_average, shift(moving_average)]
+    if option_type == "put":
+        entry, exit_signal, in_trade = bear_crosses(*vec), bull_crosses(*vec), prices < moving_average
+    else:
+        entry, exit_signal, in_trade = bull_crosses(*vec), bear_crosses(*vec), prices > moving_average
+    in_trade = entry | exit_signal | in_trade
+
+    # Remove the NaN data, see pad_data
+    start_up_window_length = max([moving_average_lag, volatility_window])
+    frame_end_length = 2 * min_days_to_expiry
+    window = slice(start_up_window_length, -frame_end_length)
+
+    return {"index": dates[window],
+            "t": np.asarray(pd.to_datetime(t.tolist()), dtype="datetime64[D]")[window],
+            "Opt_T": np.asarray(pd.to_datetime(opt_t.tolist()), dtype="datetime64[D]")[window],
+            "Price": prices[window].astype(dtype), "Volatility": volatility[window].astype(dtype),
+            "Opt_K": opt_k[window].astype(dtype),
+            "Entry": entry[window], "Exit": exit_signal[window], "In_trade": in_trade[window]}
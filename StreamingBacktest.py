@@ -0,0 +1,183 @@
+'''
+
+StreamingBacktest.py
+
+File contents:
+
+    classes
+    -------
+        RollingWindow
+        StreamingBacktest
+
+'''
+
+from collections import deque
+import numpy as np
+import pandas as pd
+from Account import Account
+from Backtest import JOURNAL_COLUMNS
+from TradeLogic import trade_logic_step
+from UtilityFunctions import bull_cross, bear_cross, get_strike_n_below_price, sorted_expiries
+
+
+class RollingWindow:
+    '''
+    Fixed length window of the latest values with O(1) updates of its mean and standard deviation.
+
+    The running sums are recomputed from the window every time it wraps around, which keeps the cost
+    amortized O(1) while stopping floating point drift from building up over long streams.
+
+    methods
+    -------
+    push - * Adds a value, dropping the oldest one once the window is full
+    mean - * Mean of the window, NaN until the window is full
+    std - * Sample standard deviation of the window, NaN until the window is full
+    '''
+
+    def __init__(self, length):
+        self.length = length
+        self.values = deque(maxlen=length)
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.pushes_since_sum = 0
+
+    def push(self, value):
+        if len(self.values) == self.length:
+            oldest = self.values[0]
+            self.total -= oldest
+            self.total_squares -= oldest * oldest
+        self.values.append(value)
+        self.total += value
+        self.total_squares += value * value
+
+        self.pushes_since_sum += 1
+        if self.pushes_since_sum >= self.length:
+            self.total = sum(self.values)
+            self.total_squares = sum(v * v for v in self.values)
+            self.pushes_since_sum = 0
+
+    def is_full(self):
+        return len(self.values) == self.length
+
+    def mean(self):
+        return self.total / self.length if self.is_full() else np.nan
+
+    def std(self):
+        if not self.is_full() or self.length < 2:
+            return np.nan
+        variance = (self.total_squares - self.total * self.total / self.length) / (self.length - 1)
+        return np.sqrt(max(variance, 0.0))
+
+
+class StreamingBacktest:
+    '''
+    Runs the strategy one bar at a time, keeping O(1) state for the moving average, historical volatility,
+    cross detection and expiration lookup, so that appended or live data never recomputes the history.
+
+    The features and signals match expand_market_data: bars before max(ma_lag, volatility_window) are
+    warm-up and are not traded. Unlike expand_market_data, the tail is not trimmed, so expiry_series has to
+    reach far enough ahead of the bars for new positions to be opened.
+
+    attributes
+    ----------
+        account_data - Account object to keep track of asset and cash value
+        trade_size_logic - Function to determine the number of contracts to trade
+        trade_journal - List of the emitted journal rows, see JOURNAL_COLUMNS
+        journal_index - The bars of the trade_journal rows
+        current_option - The current option to be traded
+        num_contracts - The current number of contracts of the option to be held
+        cost_model - Optional CostModel charging the execution costs of every entry and exit
+
+    methods
+    -------
+        update - feeds a new bar and returns its journal row (None during warm-up)
+        run - feeds every bar of a price series, e.g. for a nightly catch-up
+        export_results_as_df - returns a pd.DataFrame object of the trade_journal
+    '''
+
+    def __init__(self, trade_size_logic, option_type, expiry_series, ma_lag=200, min_days_to_expiry=90,
+                 n_strikes_away=1, volatility_window=20, account_data=None, strike_increment=2.5, cost_model=None):
+        self.account_data = Account() if account_data is None else account_data
+        self.trade_size_logic = trade_size_logic
+        self.cost_model = cost_model
+        self.option_type = option_type
+        self.direction = -1 if option_type == "put" else 1
+        self.strikes_below_price = n_strikes_away if option_type == "put" else -n_strikes_away
+        self.strike_increment = strike_increment
+        self.min_days_to_expiry = min_days_to_expiry
+        self.start_up_window_length = max([ma_lag, volatility_window])
+
+        self.moving_average = RollingWindow(ma_lag)
+        self.returns = RollingWindow(volatility_window)
+        self.n_bars = 0
+        self.previous_price = np.nan
+        self.previous_moving_average = np.nan
+
+        # Expiration pointer into the sorted expiration dates, it only moves forward as time does
+        self.expiry_values, self.expiries = sorted_expiries(expiry_series)
+        self.expiry_pointer = 0
+
+        self.trade_journal = []
+        self.journal_index = []
+        self.current_option = None
+        self.num_contracts = None
+
+    def nearest_expiry_(self, day):
+        '''First expiration more than min_days_to_expiry days after day, see get_nearest_expiries.'''
+        min_expiry = np.datetime64(pd.Timestamp(day), "ns") + np.timedelta64(self.min_days_to_expiry + 1, "D")
+        n_expiries = len(self.expiry_values)
+        while self.expiry_pointer < n_expiries and self.expiry_values[self.expiry_pointer] < min_expiry:
+            self.expiry_pointer += 1
+        return self.expiries[self.expiry_pointer] if self.expiry_pointer < n_expiries else None
+
+    def update(self, day, price):
+        if self.n_bars > 0:
+            self.returns.push(price / self.previous_price - 1)
+        self.moving_average.push(price)
+        moving_average = self.moving_average.mean()
+
+        # Signals, see call_signals and put_signals
+        vec = [price, self.previous_price, moving_average, self.previous_moving_average]
+        if self.direction > 0:
+            entry, exit_signal = bull_cross(*vec), bear_cross(*vec)
+        else:
+            entry, exit_signal = bear_cross(*vec), bull_cross(*vec)
+        in_trade = (price > moving_average) if self.direction > 0 else (price < moving_average)
+        in_trade = entry or exit_signal or in_trade
+
+        self.n_bars += 1
+        self.previous_price = price
+        self.previous_moving_average = moving_average
+        if self.n_bars <= self.start_up_window_length:
+            return None
+
+        volatility = self.returns.std() * np.sqrt(252)
+        opt_t = self.nearest_expiry_(day)
+        if opt_t is None:
+            # No expiration is far enough out to open a contract, expand_market_data trims these bars instead
+            entry = False
+        opt_k = get_strike_n_below_price(price, self.strikes_below_price, self.strike_increment)
+
+        input_vec = [self.current_option, self.num_contracts, self.trade_size_logic, self.account_data,
+                     self.option_type, None, None, self.cost_model]
+        self.current_option, self.num_contracts = trade_logic_step(in_trade, entry, exit_signal, price, volatility,
+                                                                   day, opt_t, opt_k, *input_vec)
+
+        a_value = self.account_data.asset_value
+        c_value = self.account_data.cash_value
+        if a_value is None:
+            row = (price, np.nan, c_value, c_value)
+        else:
+            row = (price, a_value, c_value, c_value + a_value)
+
+        self.trade_journal.append(row)
+        self.journal_index.append(day)
+        return row
+
+    def run(self, price_series):
+        for day, price in zip(price_series.index, price_series.to_numpy()):
+            self.update(day, price)
+
+    def export_results_as_df(self):
+        return pd.DataFrame(self.trade_journal, index=pd.Index(self.journal_index), columns=JOURNAL_COLUMNS,
+                            dtype=np.float64)
@@ -6,11 +6,24 @@ File contents:
     functions
     ---------
         trade_size_logic
+        batch_trade_size_logic
         trade_logic
+        trade_logic_step
+        portfolio_trade_logic_step
+
+    constants
+    ---------
+        TRADE_LOGIC_COLUMNS
 
 '''
 
 from BlackScholesOptionPricing import Option
+from Calendar import to_days
+from numpy import floor_divide, where, errstate
+
+
+# Market data columns used by the trade logic, in the order of the trade_logic_step arguments
+TRADE_LOGIC_COLUMNS = ["In_trade", "Entry", "Exit", "Price", "Volatility", "t", "Opt_T", "Opt_K"]
 
 
 def trade_size_logic(price, account_data, percent_cash=0.9):
@@ -30,7 +43,26 @@ def trade_size_logic(price, account_data, percent_cash=0.9):
     return int(((1 - percent_cash) * account_data.cash_value) // price)
 
 
-def trade_logic(current_market_data, current_option, num_contracts, trade_size_logic, account_data, option_type):
+def batch_trade_size_logic(prices, cash_values, percent_cash=0.9):
+    '''
+    Vectorized trade_size_logic, determines the number of contracts to trade for many accounts at once.
+
+    input
+    -----
+        prices - np.ndarray of option prices
+        cash_values - np.ndarray of the cash value of each account
+        percent_cash - percent of account to keep in cash
+
+    returns
+    -------
+        num_contracts - np.ndarray of the number of contracts to buy (0 where the option is worthless)
+    '''
+    with errstate(divide="ignore", invalid="ignore"):
+        return where(prices > 0, floor_divide((1 - percent_cash) * cash_values, prices), 0)
+
+
+def trade_logic(current_market_data, current_option, num_contracts, trade_size_logic, account_data, option_type,
+                pricing_cache=None, cost_model=None, instrumentation=None):
     '''
     Basic trading logic for the strategy.
 
@@ -49,35 +81,77 @@ def trade_logic(current_market_data, current_option, num_contracts, trade_size_l
 
         option_type - either "put" or "call"
 
+        pricing_cache - Optional PricingCache object given to the opened options
+
+        cost_model - Optional CostModel object charging the execution costs of the entries and exits
+
+        instrumentation - Optional Instrumentation object given to the opened options to time their pricing
+
     returns
     -------
         current_option, num_contracts
     '''
     cmd = current_market_data  # Short form to help make code fit
+    market_values = [cmd.loc[column] for column in TRADE_LOGIC_COLUMNS]
+    return trade_logic_step(*market_values, current_option, num_contracts, trade_size_logic, account_data, option_type,
+                            instrumentation=instrumentation, pricing_cache=pricing_cache, cost_model=cost_model)
+
+
+def trade_logic_step(in_trade, entry, exit_signal, price, volatility, t, opt_t, opt_k,
+                     current_option, num_contracts, trade_size_logic, account_data, option_type, instrumentation=None,
+                     pricing_cache=None, cost_model=None):
+    '''
+    Basic trading logic for the strategy, taking the current day's market data as scalars so that it can
+    be driven directly from columnar arrays (see TRADE_LOGIC_COLUMNS).
+
+    inputs
+    ------
+        in_trade, entry, exit_signal - Signal values for the current day
+
+        price, volatility, t - Spot price, volatility and time of the current day
+
+        opt_t, opt_k - Optimal expiration date and strike for the current day
 
-    if cmd.loc["In_trade"]:
-        if cmd.loc["Entry"]:
+        current_option, num_contracts, trade_size_logic, account_data, option_type - See trade_logic
+
+        instrumentation - Optional Instrumentation object given to the opened options to time their pricing
+
+        pricing_cache - Optional PricingCache object given to the opened options
+
+        cost_model - Optional CostModel object charging the execution costs of the entries and exits
+
+    returns
+    -------
+        current_option, num_contracts
+    '''
+    if in_trade:
+        if entry:
             # Entering a position requires:
             #     1. Opening/selecting an option contract
             #     2. Getting the spot price of the option contract
             #     3. Determining the number of contracts to purchase
             #     4. Purchasing / adding the contracts to the portfolio
             #     5. Update stop loss data
-            current_option = Option(cmd.loc["Opt_T"], cmd.loc["Opt_K"], option_type=option_type)
-            option_price = current_option.price(cmd.loc["Price"], cmd.loc["Volatility"], cmd.loc["t"])
-            num_contracts = trade_size_logic(option_price, account_data)
-            account_data.enter_position(option_price, num_contracts)
+            current_option = Option(opt_t, opt_k, option_type=option_type, instrumentation=instrumentation,
+                                    pricing_cache=pricing_cache)
+            option_price = current_option.price(price, volatility, t)
+            # The contracts are sized on their price including the execution costs so that the entry is affordable
+            unit_cost = execution_cost_(cost_model, current_option, price, volatility, t, 1, 1, option_price)
+            num_contracts = trade_size_logic(option_price + unit_cost, account_data)
+            account_data.enter_position(option_price, num_contracts, unit_cost * num_contracts)
 
         elif current_option is not None:
             # Since in the trade, will need to check and update the price of the option, requires:
             #     1. Getting the spot price of the option contract
             #     2. Updating the account details, which will depend on if the position is closing or not
             #     3. Update stop loss data
-            option_price = current_option.price(cmd.loc["Price"], cmd.loc["Volatility"], cmd.loc["t"])
+            option_price = current_option.price(price, volatility, t)
 
-            if cmd.loc["Exit"]:
+            if exit_signal:
                 # Reset current_option and num_contracts
-                account_data.exit_position(option_price, num_contracts)
+                cost = execution_cost_(cost_model, current_option, price, volatility, t, num_contracts, -1,
+                                       option_price)
+                account_data.exit_position(option_price, num_contracts, cost)
                 current_option = None
                 num_contracts = None
 
@@ -86,3 +160,59 @@ def trade_logic(current_market_data, current_option, num_contracts, trade_size_l
                 account_data.update_position(option_price, num_contracts)
 
     return current_option, num_contracts
+
+
+def execution_cost_(cost_model, option, price, volatility, t, num_contracts, side, option_price):
+    '''Execution cost of trading num_contracts of option, nothing without a cost_model.'''
+    if cost_model is None:
+        return 0.0
+    return cost_model.costs(price, option.K, option.format_tau(t), option.r, volatility,
+                            option.option_type == "call", num_contracts, side, option_price)
+
+
+def portfolio_trade_logic_step(in_trade, entry, exit_signal, price, volatility, t, opt_t, opt_k,
+                               portfolio, trade_size_logic, option_type, underlying=0, risk_free_rate=0.03,
+                               cost_model=None):
+    '''
+    The trading logic of trade_logic_step run against a Portfolio, where an entry adds a position to the ones
+    already held and an exit closes every position.
+
+    inputs
+    ------
+        in_trade, entry, exit_signal, price, volatility, t, opt_t, opt_k - See trade_logic_step
+
+        portfolio - Portfolio object holding the positions and the account
+
+        trade_size_logic - Function that determines the number of contracts to trade
+
+        option_type - either "put" or "call"
+
+        underlying - Index of the underlying asset in the portfolio
+
+        risk_free_rate - The rate of a risk-free asset given as an annual percent
+
+        cost_model - Optional CostModel object charging the execution costs of the entries and exits
+    '''
+    if in_trade:
+        if len(portfolio) > 0:
+            # Mark every held position to market with one pricing call
+            held_prices = portfolio.mark_to_market(price, volatility, t)
+
+        if entry:
+            tau = (to_days(opt_t) - to_days(t)).astype(float) / 365
+            option_price = portfolio.pricing_function(price, opt_k, tau, risk_free_rate, volatility,
+                                                      option_type == "call")
+            unit_cost = 0.0 if cost_model is None else cost_model.costs(price, opt_k, tau, risk_free_rate, volatility,
+                                                                        option_type == "call", 1, 1, option_price)
+            num_contracts = trade_size_logic(option_price + unit_cost, portfolio.account_data)
+            portfolio.open_position(underlying, option_type, opt_k, opt_t, num_contracts, option_price, risk_free_rate,
+                                    unit_cost * num_contracts)
+
+        elif len(portfolio) > 0 and exit_signal:
+            cost = 0.0
+            if cost_model is not None:
+                tau = (portfolio["expiry"] - to_days(t)).astype(float) / 365
+                costs = cost_model.costs(price, portfolio["strike"], tau, portfolio["rate"], volatility,
+                                         portfolio["is_call"], portfolio["num_contracts"], -1, held_prices)
+                cost = float(costs.sum())
+            portfolio.close_positions(cost=cost)
@@ -0,0 +1,104 @@
+'''
+
+TransactionCosts.py
+
+File contents:
+
+    classes
+    -------
+        CostModel
+
+    functions
+    ---------
+        cost_model_from_parameters
+
+    constants
+    ---------
+        COST_PARAMETERS
+
+'''
+
+import numpy as np
+from BlackScholesOptionPricing import option_prices
+
+
+# Parameters of CostModel with the values that make trading free, so they can be swept like strategy parameters
+COST_PARAMETERS = {"commission": 0.0, "spread": 0.0, "moneyness_spread": 0.0, "tau_spread": 0.0,
+                   "min_spread": 0.0, "vol_slippage": 0.0}
+
+
+class CostModel:
+    '''
+    Execution costs of option trades: a per contract commission, half the bid/ask spread, and slippage of the
+    volatility the fill is priced at. Positions are still valued at the Black-Scholes mid price, the costs
+    are paid from the account's cash on every entry and exit.
+
+    The bid/ask spread of a contract is a fraction of its mid price that widens away from the money and close
+    to expiration:
+
+        bid/ask spread = max(min_spread, mid * (spread + moneyness_spread * |ln(S/K)| + tau_spread / sqrt(tau)))
+
+    with tau floored at one day.
+
+    initial inputs
+    --------------
+    commission - Commission per contract traded
+    spread - Bid/ask spread as a fraction of the mid price at the money and a year from expiration
+    moneyness_spread - Widening of the relative spread per unit of |ln(S/K)|
+    tau_spread - Widening of the relative spread as 1 / sqrt(tau), tau in years
+    min_spread - Smallest bid/ask spread per contract (e.g. one tick)
+    vol_slippage - Volatility the fill is priced away from the mid volatility, against the trader (0.01 being
+                   one volatility point)
+
+    methods
+    -------
+    half_spreads - * Returns half of the bid/ask spread of every contract
+                   * Inputs:
+                       spot_price, strike, time_to_expiration, mid_price
+
+    costs - * Returns the total execution cost in cash of trades, element-wise
+            * Inputs:
+                spot_price, strike, time_to_expiration, risk_free_rate, volatility, is_call, num_contracts
+                side - +1 buying, -1 selling
+                mid_price - the Black-Scholes mid price when already known
+    '''
+
+    def __init__(self, commission=0.0, spread=0.0, moneyness_spread=0.0, tau_spread=0.0, min_spread=0.0,
+                 vol_slippage=0.0):
+        self.commission = commission
+        self.spread = spread
+        self.moneyness_spread = moneyness_spread
+        self.tau_spread = tau_spread
+        self.min_spread = min_spread
+        self.vol_slippage = vol_slippage
+
+    def half_spreads(self, spot_price, strike, time_to_expiration, mid_price):
+        tau = np.maximum(time_to_expiration, 1 / 365)
+        relative_spread = (self.spread + self.moneyness_spread * np.abs(np.log(spot_price / strike))
+                           + self.tau_spread / np.sqrt(tau))
+        return 0.5 * np.maximum(self.min_spread, mid_price * relative_spread)
+
+    def costs(self, spot_price, strike, time_to_expiration, risk_free_rate, volatility, is_call, num_contracts,
+              side=1, mid_price=None):
+        if mid_price is None:
+            mid_price = option_prices(spot_price, strike, time_to_expiration, risk_free_rate, volatility, is_call)
+
+        cost_per_contract = self.commission + self.half_spreads(spot_price, strike, time_to_expiration, mid_price)
+        if self.vol_slippage != 0:
+            slipped_volatility = np.maximum(volatility + side * self.vol_slippage, 1e-8)
+            slipped_price = option_prices(spot_price, strike, time_to_expiration, risk_free_rate,
+                                          slipped_volatility, is_call)
+            cost_per_contract = cost_per_contract + np.maximum(side * (slipped_price - mid_price), 0.0)
+
+        return (cost_per_contract * np.abs(num_contracts))[()]
+
+
+def cost_model_from_parameters(parameters):
+    '''
+    Builds the CostModel of the COST_PARAMETERS in a dictionary (e.g. a sweep configuration), None when trading
+    is free so that the cost-free path runs unchanged.
+    '''
+    values = {name: parameters.get(name, default) for name, default in COST_PARAMETERS.items()}
+    if all(value == COST_PARAMETERS[name] for name, value in values.items()):
+        return None
+    return CostModel(**values)
@@ -7,11 +7,18 @@ File contents:
     ---------
         get_month_number
         get_nearest_expiry
+        get_nearest_expiries
+        sorted_expiries
         get_strike_n_below_price
         bull_cross
         bear_cross
+        bull_crosses
+        bear_crosses
 
 '''
+from numpy import asarray, full, searchsorted, timedelta64
+from pandas import Series, to_datetime
+from Calendar import month_codes, strike_grid
 
 
 def bull_cross(p1, p0, m1, m0):
@@ -30,10 +37,19 @@ def bear_cross(p1, p0, m1, m0):
     return False
 
 
+def bull_crosses(p1, p0, m1, m0):
+    '''Vectorized bull_cross, determines element-wise where line p crosses over from below to above line m'''
+    return (p0 <= m0) & (p1 > m1)
+
+
+def bear_crosses(p1, p0, m1, m0):
+    '''Vectorized bear_cross, determines element-wise where line p crosses over from above to below line m'''
+    return (p0 >= m0) & (p1 < m1)
+
+
 def get_month_number(df):
     '''Classifies dates by their month.'''
-    base_year = df.index[0].year
-    return [12 * (i.year - base_year) + i.month for i in df.index]
+    return month_codes(df.index)
 
 
 def get_nearest_expiry(time_a, min_days_to_expiry, expiry_series):
@@ -46,6 +62,39 @@ def get_nearest_expiry(time_a, min_days_to_expiry, expiry_series):
         return None
 
 
-def get_strike_n_below_price(S, n=1):
-    '''Returns the closest strike after n strikes, assuming that strikes are multiples of 2.5'''
-    return ((S // 2.5) - (n-1)) * 2.5
\ No newline at end of file
+def get_nearest_expiries(times, min_days_to_expiry, expiry_series):
+    '''
+    Vectorized get_nearest_expiry, returns the closest expiration date after min_days for every time in
+    times using a binary search over the sorted expiration dates. Returns a pd.Series aligned to times.index,
+    holding None where no expiration date is left.
+    '''
+    expiry_values, original_expiries = sorted_expiries(expiry_series)
+
+    # (expiry - t).days > min_days  <=>  expiry >= t + (min_days + 1) days
+    min_expiry = asarray(to_datetime(times.tolist()), dtype="datetime64[ns]") + timedelta64(min_days_to_expiry + 1, "D")
+    positions = searchsorted(expiry_values, min_expiry, side="left")
+
+    found = positions < len(expiry_values)
+    nearest = full(len(times), None, dtype=object)
+    nearest[found] = original_expiries[positions[found]]
+    return Series(nearest.tolist(), index=times.index)
+
+
+def sorted_expiries(expiry_series):
+    '''
+    Sorts the expiration dates of expiry_series, dropping the missing ones.
+
+    returns
+    -------
+        expiry_values - datetime64[ns] np.ndarray of the sorted expiration dates, to search through
+        original_expiries - np.ndarray of the same dates as given in expiry_series (e.g. date objects)
+    '''
+    expiries = expiry_series.dropna()
+    expiry_values = asarray(to_datetime(expiries.tolist()), dtype="datetime64[ns]")
+    order = expiry_values.argsort(kind="stable")
+    return expiry_values[order], expiries.to_numpy(dtype=object)[order]
+
+
+def get_strike_n_below_price(S, n=1, strike_increment=2.5):
+    '''Returns the closest strike after n strikes, assuming that strikes are multiples of strike_increment'''
+    return strike_grid(S, n, strike_increment)
\ No newline at end of file
@@ -0,0 +1,171 @@
+'''
+
+WalkForward.py
+
+File contents:
+
+    functions
+    ---------
+        walk_forward_windows
+        expand_candidates
+        run_window
+        run_walk_forward
+
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial, reduce
+import numpy as np
+import pandas as pd
+from Backtest import Backtest
+from FeatureCache import default_feature_cache
+from ParameterSweep import initialize_worker, summarize_results, worker_data
+from SignalCreation import expand_market_data
+from TradeLogic import trade_size_logic
+
+
+def walk_forward_windows(n_days, train_length, test_length, step=None):
+    '''
+    Splits n_days into consecutive train/test windows, every test window directly following its train window.
+
+    input
+    -----
+        n_days - the number of days to split
+        train_length, test_length - the number of days of the train and test windows
+        step - the number of days between the starts of consecutive windows, defaults to test_length so that
+               the test windows tile the days
+
+    returns
+    -------
+        list of (train, test) pairs of slices into the days
+    '''
+    step = test_length if step is None else step
+    windows = []
+    start = 0
+    while start + train_length + test_length <= n_days:
+        train = slice(start, start + train_length)
+        windows.append((train, slice(train.stop, train.stop + test_length)))
+        start += step
+    return windows
+
+
+def expand_candidates(price_series, expiry_series, ma_lags, option_type="call", min_days_to_expiry=90,
+                      n_strikes_away=1, volatility_window=20, feature_cache=default_feature_cache,
+                      strike_increment=2.5):
+    '''
+    Expands the market data of every candidate ma_lag once over the full history, trimmed to the days every
+    candidate has data for. The features at the start of a window are therefore warmed up on the history
+    before it instead of being recomputed from the window alone.
+
+    returns
+    -------
+        dictionary of ma_lag to its expanded market data, all sharing the same index
+    '''
+    market_data = {ma_lag: expand_market_data(price_series, option_type, ma_lag, expiry_series,
+                                              min_days_to_expiry=min_days_to_expiry, n_strikes_away=n_strikes_away,
+                                              volatility_window=volatility_window, feature_cache=feature_cache,
+                                              strike_increment=strike_increment)
+                   for ma_lag in ma_lags}
+    common_index = reduce(lambda a, b: a.intersection(b, sort=False), [md.index for md in market_data.values()])
+    return {ma_lag: md.loc[common_index] for ma_lag, md in market_data.items()}
+
+
+def run_window(ma_lag, window, market_data=None, option_type=None, size_logic=None):
+    '''
+    Runs a Backtest of one candidate over a window of its precomputed market data, using the worker's shared
+    data when none is given.
+
+    returns
+    -------
+        pd.DataFrame of the window's trade journal, see Backtest.export_results_as_df
+    '''
+    market_data = worker_data("market_data", market_data)
+    option_type = worker_data("option_type", option_type)
+    size_logic = worker_data("size_logic", size_logic)
+
+    bt = Backtest(None, size_logic, option_type, None, ma_lag, market_data=market_data[ma_lag].iloc[window])
+    bt.run_backtest()
+    return bt.export_results_as_df()
+
+
+def run_windows_(tasks, market_data, option_type, size_logic, max_workers):
+    if max_workers == 1:
+        return [run_window(ma_lag, window, market_data, option_type, size_logic) for ma_lag, window in tasks]
+    # The expanded market data is sent once per worker through the initializer of ParameterSweep
+    initializer = partial(initialize_worker, market_data=market_data, option_type=option_type, size_logic=size_logic)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=initializer) as executor:
+        return list(executor.map(run_window, *zip(*tasks)))
+
+
+def run_walk_forward(price_series, expiry_series, ma_lags, train_length, test_length, step=None,
+                     option_type="call", size_logic=trade_size_logic, objective="TotalReturn", min_days_to_expiry=90,
+                     n_strikes_away=1, volatility_window=20, feature_cache=default_feature_cache, max_workers=1,
+                     strike_increment=2.5):
+    '''
+    Walk-forward validation of ma_lag: the candidate with the best objective on every train window is run on
+    the test window that follows it. The market data is expanded once and every window runs over a view of it.
+
+    input
+    -----
+        price_series - pd.Series of asset prices
+        expiry_series - pd.Series of option expiration dates
+        ma_lags - the candidate moving average lags
+        train_length, test_length, step - the windows in days of expanded market data, see walk_forward_windows.
+                                          step must be at least test_length so that the test windows do
+                                          not overlap.
+        option_type - either "put" or "call"
+        size_logic - function to determine the number of contracts to trade
+        objective - metric of summarize_results that is maximized on the train windows. Candidates without a
+                    value (NaN, e.g. the WinRate of a window without trades) are only chosen when no candidate
+                    has one, the first candidate being run then.
+        min_days_to_expiry, n_strikes_away, volatility_window, strike_increment - see expand_market_data
+        feature_cache - FeatureCache used by the expansion (None to always recompute the features)
+        max_workers - number of worker processes, 1 runs every window in the current process
+
+    returns
+    -------
+        equity_curve - pd.Series of the stitched out-of-sample portfolio value. Every test window starts from a
+                       fresh account and its returns are compounded onto the final value of the previous one.
+        windows - pd.DataFrame with one row per window of its dates, chosen ma_lag and metrics
+    '''
+    if step is not None and step < test_length:
+        raise ValueError("step (%d) must be at least test_length (%d) to stitch the test windows"
+                         % (step, test_length))
+
+    market_data = expand_candidates(price_series, expiry_series, ma_lags, option_type, min_days_to_expiry,
+                                    n_strikes_away, volatility_window, feature_cache, strike_increment)
+    index = next(iter(market_data.values())).index
+    windows = walk_forward_windows(len(index), train_length, test_length, step)
+    if not windows:
+        raise ValueError("%d days of market data are too few for a %d day train and %d day test window"
+                         % (len(index), train_length, test_length))
+
+    # Every candidate on every train window
+    train_tasks = [(ma_lag, train) for train, _ in windows for ma_lag in ma_lags]
+    train_results = run_windows_(train_tasks, market_data, option_type, size_logic, max_workers)
+    train_scores = np.array([summarize_results(journal)[objective] for journal in train_results], dtype=float)
+    train_scores = train_scores.reshape(len(windows), len(ma_lags))
+    # NaN ranks below every score, argmax taking the first candidate of a window where every score is NaN
+    best = np.where(np.isnan(train_scores), -np.inf, train_scores).argmax(axis=1)
+    best_lags = [ma_lags[i] for i in best]
+
+    # The best candidate of every train window on its test window
+    test_tasks = [(ma_lag, test) for ma_lag, (_, test) in zip(best_lags, windows)]
+    test_results = run_windows_(test_tasks, market_data, option_type, size_logic, max_workers)
+
+    rows = []
+    curves = []
+    equity = None
+    for (train, test), ma_lag, score, journal in zip(windows, best_lags, train_scores[np.arange(len(windows)), best],
+                                                    test_results):
+        portfolio_value = journal.PortfolioValue
+        equity = portfolio_value.iloc[0] if equity is None else equity
+        curves.append(portfolio_value / portfolio_value.iloc[0] * equity)
+        equity = curves[-1].iloc[-1]
+
+        rows.append(dict({"TrainStart": index[train.start], "TrainEnd": index[train.stop - 1],
+                          "TestStart": index[test.start], "TestEnd": index[test.stop - 1], "ma_lag": ma_lag,
+                          "Train" + objective: score},
+                         **{"Test" + name: value for name, value in summarize_results(journal).items()}))
+
+    return pd.concat(curves).rename("PortfolioValue"), pd.DataFrame(rows)
@@ -0,0 +1,72 @@
+'''
+
+test_Backtest.py
+
+Regression tests of Backtest, run with pytest from the repository root.
+
+'''
+
+import pandas as pd
+import pytest
+from Backtest import Backtest
+from Instrumentation import Instrumentation
+from PriceSimulation import create_ou_process, simulate_expiry_dates
+from TradeLogic import trade_size_logic
+
+
+def ou_series_(index_type):
+    '''Price and expiry series of an OU process, indexed by date objects or by a DatetimeIndex.'''
+    price_series, expiry_series = create_ou_process(sample_length=600, random_state=0)
+    if index_type == "datetime":
+        price_series.index = pd.DatetimeIndex(price_series.index)
+        expiry_series = simulate_expiry_dates(price_series)
+    return price_series, expiry_series
+
+
+def run_journal_(price_series, expiry_series, option_type, columnar):
+    bt = Backtest(price_series, trade_size_logic, option_type, expiry_series, 50)
+    bt.run_backtest(columnar=columnar)
+    return bt.export_results_as_df()
+
+
+@pytest.mark.parametrize("index_type", ["date", "datetime"])
+@pytest.mark.parametrize("option_type", ["call", "put"])
+def test_columnar_journal_matches_rows(index_type, option_type):
+    price_series, expiry_series = ou_series_(index_type)
+    columnar = run_journal_(price_series, expiry_series, option_type, columnar=True)
+    rows = run_journal_(price_series, expiry_series, option_type, columnar=False)
+    pd.testing.assert_frame_equal(columnar, rows)
+
+
+def test_multi_position_records_portfolio_greeks():
+    price_series, expiry_series = ou_series_("datetime")
+    bt = Backtest(price_series, trade_size_logic, "call", expiry_series, 50, record_greeks=True, multi_position=True)
+    bt.run_backtest()
+    journal = bt.export_results_as_df()
+    held = journal.AssetValue.notna().to_numpy()
+    assert held.any()
+    assert (journal.Delta.to_numpy()[held] > 0).any()
+    assert (journal.Delta.to_numpy()[~held] == 0).all()
+
+
+@pytest.mark.parametrize("multi_position", [False, True])
+@pytest.mark.parametrize("columnar", [True, False])
+def test_instrumentation_covers_every_path(columnar, multi_position):
+    price_series, expiry_series = ou_series_("datetime")
+    instrumentation = Instrumentation()
+    bt = Backtest(price_series, trade_size_logic, "call", expiry_series, 50, multi_position=multi_position,
+                  instrumentation=instrumentation)
+    bt.run_backtest(columnar=columnar)
+    sections = set(bt.export_instrumentation_as_df().index)
+    assert {"option_pricing", "trade_logic_entry", "trade_logic_update", "trade_logic_idle"} <= sections
+
+
+def test_chunked_run_is_instrumented():
+    price_series, expiry_series = ou_series_("datetime")
+    instrumentation = Instrumentation()
+    bt = Backtest(price_series, trade_size_logic, "call", expiry_series, 50, instrumentation=instrumentation)
+    for _ in bt.run_backtest_in_chunks(chunk_size=100):
+        pass
+    sections = set(bt.export_instrumentation_as_df().index)
+    assert {"option_pricing", "trade_logic_entry", "trade_logic_update", "trade_logic_idle"} <= sections
+    pd.testing.assert_frame_equal(bt.export_results_as_df(), run_journal_(price_series, expiry_series, "call", True))
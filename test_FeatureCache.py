@@ -0,0 +1,34 @@
+'''
+
+test_FeatureCache.py
+
+Tests of FeatureCache, run with pytest from the repository root.
+
+'''
+
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from FeatureCache import FeatureCache
+
+
+def test_shared_between_threads():
+    cache = FeatureCache(maxsize=2)
+
+    def look_up(seed):
+        rng = random.Random(seed)
+        for _ in range(5000):
+            key = rng.randrange(4)
+            assert cache.get(("feature", key), lambda value: 2 * value, key) == 2 * key
+
+    # Switch threads as often as possible so that evictions race with the lookups
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(look_up, range(8)))
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    assert cache.hits + cache.misses == 8 * 5000
+    assert len(cache) <= 2
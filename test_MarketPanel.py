@@ -0,0 +1,34 @@
+'''
+
+test_MarketPanel.py
+
+Tests of PanelBacktest, run with pytest from the repository root.
+
+'''
+
+import numpy as np
+import pandas as pd
+import pytest
+from Backtest import Backtest
+from MarketPanel import PanelBacktest
+from PriceSimulation import create_ou_process, simulate_expiry_dates
+from TradeLogic import trade_size_logic
+from TransactionCosts import CostModel
+
+
+@pytest.mark.parametrize("cost_model", [None, CostModel(commission=0.65, spread=0.02, vol_slippage=0.01)])
+def test_single_ticker_matches_multi_position_backtest(cost_model):
+    price_series, _ = create_ou_process(sample_length=600, random_state=0)
+    price_series.index = pd.DatetimeIndex(price_series.index)
+    expiry_series = simulate_expiry_dates(price_series)
+
+    panel = PanelBacktest(pd.DataFrame({"A": price_series}), trade_size_logic, "call", expiry_series, 50,
+                          dtype=np.float64, cost_model=cost_model)
+    panel.run_backtest()
+    bt = Backtest(price_series, trade_size_logic, "call", expiry_series, 50, multi_position=True,
+                  cost_model=cost_model)
+    bt.run_backtest()
+
+    panel_values = panel.export_results_as_df().PortfolioValue
+    np.testing.assert_allclose(panel_values, bt.export_results_as_df().PortfolioValue.loc[panel_values.index],
+                               rtol=1e-9)
@@ -0,0 +1,36 @@
+'''
+
+test_PricingCache.py
+
+Tests of PricingCache, run with pytest from the repository root.
+
+'''
+
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from BlackScholesOptionPricing import call_option_prices
+from PricingCache import PricingCache
+
+
+def test_shared_between_threads():
+    cache = PricingCache(maxsize=2)
+
+    def price(seed):
+        rng = random.Random(seed)
+        for _ in range(5000):
+            spot_price = 30 + rng.randrange(4)
+            assert cache.price(call_option_prices, spot_price, 30, 0.25, 0.03, 0.2) == \
+                call_option_prices(spot_price, 30, 0.25, 0.03, 0.2)
+
+    # Switch threads as often as possible so that evictions race with the lookups
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(price, range(8)))
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    assert cache.hits + cache.misses == 8 * 5000
+    assert len(cache) <= 2